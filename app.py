@@ -0,0 +1,329 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils"))
+
+from parser import parse_query
+from recommender import load_dataset, get_catalog, recommend_phone, feature_weights, query_cache
+from catalog_holder import CatalogHolder
+from facets import facet_counts
+from session import SessionStore, converse
+from shared_catalog import publish_catalog, attach_catalog, release_segments
+from semantic import attach_semantic
+from tracing import Trace, SlowRequestProfiler, observe_trace, render_metrics
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "tagged_dataset.csv")
+
+# Typed keys for the state create_app stores on the application
+DF_KEY = web.AppKey("df", object)
+CATALOG_PATH_KEY = web.AppKey("catalog_path", str)
+RELOAD_INTERVAL_KEY = web.AppKey("reload_interval", object)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+MAX_PENDING_KEY = web.AppKey("max_pending", int)
+TIMEOUT_KEY = web.AppKey("timeout", float)
+MAX_TOP_N_KEY = web.AppKey("max_top_n", int)
+LOAD_KEY = web.AppKey("load", dict)
+HOLDER_KEY = web.AppKey("holder", object)
+SESSIONS_KEY = web.AppKey("sessions", SessionStore)
+PROFILER_KEY = web.AppKey("profiler", SlowRequestProfiler)
+
+# HTTP service around recommend_phone.
+# The catalog is loaded once at startup and shared read-only by every request.
+# With reload_interval set, a CatalogHolder watches the tagged file and swaps
+# in a rebuilt catalog; each request uses the snapshot current when it arrived.
+# Scoring is CPU-bound, so it runs in a bounded thread pool; once max_pending
+# requests are in flight new ones get 429, and slow ones get 504 after timeout.
+def to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_response(payload, status=200):
+    return web.json_response(payload, status=status, dumps=partial(json.dumps, default=to_builtin))
+
+def result_records(result):
+    # Same rows as result.to_dict("records"), built from column lists; to_dict goes
+    # through itertuples and was most of the CPU time of a cached request
+    columns = list(result.columns)
+    return [dict(zip(columns, row)) for row in zip(*(result[column].tolist() for column in columns))]
+
+def recommendation_payload(query, result):
+    payload = {"query": {"intent": query.intent, "budget": query.budget, "features": sorted(query.features), "specs": dict(query.spec_filters)}}
+    if isinstance(result, str):
+        payload["message"] = result
+        payload["results"] = []
+    else:
+        payload["results"] = result_records(result)
+    return payload
+
+def release_slot(app):
+    app[LOAD_KEY]["pending"] -= 1
+
+async def read_request(request):
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Request body must be a JSON object")
+        return body
+    return dict(request.query)
+
+def json_error(error_class, message):
+    return error_class(text=json.dumps({"error": message}), content_type="application/json")
+
+def text_field(body, name):
+    # An optional string field; a JSON body can hold any type there, which is a 400
+    value = body.get(name)
+    if value is not None and not isinstance(value, str):
+        raise json_error(web.HTTPBadRequest, f"{name} must be a string")
+    return value or None
+
+def run_traced(app, func, *args, trace=None, **options):
+    # Time spent waiting for a worker thread is reported as its own stage
+    if trace:
+        trace.mark("queue")
+        options["trace"] = trace
+    return app[PROFILER_KEY].call(func, *args, **options)
+
+async def run_bounded(app, func, *args, trace=None, **options):
+    # Runs func in the executor for a handler: past max_pending requests in flight
+    # this raises 429, and a call still running after timeout raises 504. A slot is
+    # held until the worker thread finishes, even if the client already got a 504.
+    if app[LOAD_KEY]["pending"] >= app[MAX_PENDING_KEY]:
+        raise json_error(web.HTTPTooManyRequests, "Too many requests in flight, retry shortly")
+    app[LOAD_KEY]["pending"] += 1
+    loop = asyncio.get_running_loop()
+    job = loop.run_in_executor(app[EXECUTOR_KEY], partial(run_traced, app, func, *args, trace=trace, **options))
+    job.add_done_callback(lambda _: release_slot(app))
+    try:
+        return await asyncio.wait_for(asyncio.shield(job), timeout=app[TIMEOUT_KEY])
+    except asyncio.TimeoutError:
+        if trace:
+            job.add_done_callback(lambda _: observe_trace(trace, "timeout"))
+        raise json_error(web.HTTPGatewayTimeout, "Request timed out")
+
+async def recommend(request):
+    app = request.app
+    body = await read_request(request)
+
+    prompt = str(body.get("prompt", "")).strip()
+    if not prompt:
+        return json_response({"error": "prompt is required"}, status=400)
+    try:
+        top_n = int(body.get("top_n", 5))
+        offset = int(body.get("offset", 0))
+    except (TypeError, ValueError):
+        return json_response({"error": "top_n and offset must be integers"}, status=400)
+    if not 1 <= top_n <= app[MAX_TOP_N_KEY] or offset < 0:
+        return json_response({"error": f"top_n must be between 1 and {app[MAX_TOP_N_KEY]} and offset must not be negative"}, status=400)
+    # The prompt is parsed once; recommend_phone and the payload both use this query
+    query = parse_query(prompt)
+    brand = text_field(body, "brand") or query.brand
+
+    trace = Trace()
+    result = await run_bounded(app, recommend_phone, query, current_catalog(app), trace=trace, top_n=top_n, brand_filter=brand, offset=offset)
+    observe_trace(trace, "empty" if isinstance(result, str) else "ok")
+
+    payload = recommendation_payload(query, result)
+    payload["query"]["brand"] = brand
+    if body.get("trace") in (True, "1", "true"):
+        payload["trace"] = trace.as_dict()
+    return json_response(payload)
+
+async def chat(request):
+    # One turn of a conversation. Without a known session_id (or with "reset") a new
+    # session starts from the prompt; otherwise the prompt refines the session's query.
+    # Sessions live in this process only, so pre-fork workers do not share them.
+    app = request.app
+    body = await read_request(request)
+    prompt = str(body.get("prompt", "")).strip()
+    if not prompt:
+        return json_response({"error": "prompt is required"}, status=400)
+    try:
+        top_n = int(body.get("top_n", 5))
+    except (TypeError, ValueError):
+        return json_response({"error": "top_n must be an integer"}, status=400)
+    if not 1 <= top_n <= app[MAX_TOP_N_KEY]:
+        return json_response({"error": f"top_n must be between 1 and {app[MAX_TOP_N_KEY]}"}, status=400)
+    session_id = text_field(body, "session_id")
+    brand = text_field(body, "brand")
+    if session_id and body.get("reset") in (True, "1", "true"):
+        app[SESSIONS_KEY].drop(session_id)
+        session_id = None
+
+    # A turn that times out still completes in the background and updates the session
+    trace = Trace()
+    session_id, query, result, mode = await run_bounded(app, converse, app[SESSIONS_KEY], session_id, parse_query(prompt), current_catalog(app), trace=trace, top_n=top_n, brand_filter=brand)
+    observe_trace(trace, "empty" if isinstance(result, str) else "ok")
+    payload = {"session_id": session_id, "mode": mode, "query": query}
+    if isinstance(result, str):
+        payload["message"] = result
+        payload["results"] = []
+    else:
+        payload["results"] = result_records(result)
+    if body.get("trace") in (True, "1", "true"):
+        payload["trace"] = trace.as_dict()
+    return json_response(payload)
+
+async def facets(request):
+    # Tag counts and a price histogram for the phones matching a prompt and/or explicit filters
+    app = request.app
+    body = await read_request(request)
+    prompt = str(body.get("prompt", "")).strip() or None
+    try:
+        budget = int(body["budget"]) if body.get("budget") not in (None, "") else None
+    except (TypeError, ValueError):
+        return json_response({"error": "budget must be an integer"}, status=400)
+    query = parse_query(prompt) if prompt else None
+    brand = text_field(body, "brand") or (query.brand if query else None)
+    intent = text_field(body, "intent")
+
+    counts = await run_bounded(app, facet_counts, current_catalog(app), query, brand_filter=brand, budget=budget, intent=intent)
+    counts["query"] = {"prompt": prompt, "brand": brand, "budget": budget, "intent": intent}
+    return json_response(counts)
+
+async def health(request):
+    return json_response({"status": "ok", "phones": len(current_catalog(request.app))})
+
+async def stats(request):
+    payload = {"pending": request.app[LOAD_KEY]["pending"], "cache": query_cache.stats(), "sessions": request.app[SESSIONS_KEY].stats()}
+    if request.app[HOLDER_KEY] is not None:
+        payload["catalog"] = request.app[HOLDER_KEY].stats()
+    return json_response(payload)
+
+async def metrics(request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+async def profiles(request):
+    return json_response({"reports": list(request.app[PROFILER_KEY].reports)})
+
+def current_catalog(app):
+    holder = app[HOLDER_KEY]
+    return holder.current if holder is not None else app[DF_KEY]
+
+async def load_catalog(app):
+    loop = asyncio.get_running_loop()
+    if app[DF_KEY] is None and app[RELOAD_INTERVAL_KEY]:
+        holder = await loop.run_in_executor(app[EXECUTOR_KEY], partial(CatalogHolder, app[CATALOG_PATH_KEY], poll_interval=app[RELOAD_INTERVAL_KEY]))
+        app[HOLDER_KEY] = holder.start()
+        return
+    if app[DF_KEY] is None:
+        app[DF_KEY] = await loop.run_in_executor(app[EXECUTOR_KEY], load_dataset, app[CATALOG_PATH_KEY])
+        attach_semantic(get_catalog(app[DF_KEY], feature_weights), app[CATALOG_PATH_KEY])
+    get_catalog(app[DF_KEY], feature_weights)
+
+async def stop_holder(app):
+    if app[HOLDER_KEY] is not None:
+        app[HOLDER_KEY].stop()
+
+async def shutdown_executor(app):
+    app[EXECUTOR_KEY].shutdown(wait=False, cancel_futures=True)
+
+def create_app(df=None, catalog_path=DEFAULT_CATALOG, max_workers=4, max_pending=64, timeout=5.0, max_top_n=50, reload_interval=None, profiler=None, max_sessions=10000, session_ttl=1800):
+    app = web.Application()
+    app[DF_KEY] = df
+    app[CATALOG_PATH_KEY] = catalog_path
+    app[RELOAD_INTERVAL_KEY] = reload_interval
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recommend")
+    app[MAX_PENDING_KEY] = max_pending
+    app[TIMEOUT_KEY] = timeout
+    app[MAX_TOP_N_KEY] = max_top_n
+    # Mutable counters live in a dict; the app mapping itself is frozen once started
+    app[LOAD_KEY] = {"pending": 0}
+    app[HOLDER_KEY] = None
+    app[SESSIONS_KEY] = SessionStore(maxsize=max_sessions, ttl=session_ttl)
+    # Profiling is off unless a SlowRequestProfiler with a sample rate is passed in
+    app[PROFILER_KEY] = profiler or SlowRequestProfiler(sample_rate=0)
+    app.on_startup.append(load_catalog)
+    app.on_cleanup.append(stop_holder)
+    app.on_cleanup.append(shutdown_executor)
+    app.router.add_get("/recommend", recommend)
+    app.router.add_post("/recommend", recommend)
+    app.router.add_get("/chat", chat)
+    app.router.add_post("/chat", chat)
+    app.router.add_get("/facets", facets)
+    app.router.add_post("/facets", facets)
+    app.router.add_get("/health", health)
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/profiles", profiles)
+    return app
+
+# Pre-fork serving
+# The parent loads the catalog once and publishes its arrays to shared memory;
+# each worker process attaches to them and serves on the same port (SO_REUSEPORT).
+def run_worker(handle, config):
+    catalog, segments = attach_catalog(handle, feature_weights)
+    # The semantic index is memory-mapped, so workers share its pages through the OS cache
+    attach_semantic(catalog, config["catalog_path"])
+    try:
+        web.run_app(create_app(df=catalog, **app_options(config)), host=config["host"], port=config["port"], reuse_port=True, print=None)
+    finally:
+        release_segments(segments)
+
+def serve_prefork(config):
+    workers, host, port = config["workers"], config["host"], config["port"]
+    catalog = get_catalog(load_dataset(config["catalog_path"]), feature_weights)
+    handle, segments = publish_catalog(catalog)
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(handle, config), daemon=True) for _ in range(workers)]
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.start()
+        print(f"Serving on http://{host}:{port} with {workers} workers")
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        release_segments(segments, unlink=True)
+
+# Configuration
+# Every PHONIX_* variable is read once, here, into plain values that can be handed
+# to spawned pre-fork workers; app_options turns them into create_app arguments
+# in whichever process builds the app.
+def read_config(environ=os.environ):
+    return {
+        "catalog_path": environ.get("PHONIX_CATALOG", DEFAULT_CATALOG),
+        "host": environ.get("PHONIX_HOST", "127.0.0.1"),
+        "port": int(environ.get("PHONIX_PORT", "8080")),
+        "workers": int(environ.get("PHONIX_WORKERS", "1")),
+        # Hot reload is only available with a single process; pre-fork workers share one published catalog
+        "reload_interval": float(environ.get("PHONIX_RELOAD_INTERVAL", "0")) or None,
+        "profile": {
+            "sample_rate": float(environ.get("PHONIX_PROFILE_RATE", "0")),
+            "slow_ms": float(environ.get("PHONIX_PROFILE_SLOW_MS", "100")),
+            "output_dir": environ.get("PHONIX_PROFILE_DIR"),
+        },
+        "max_sessions": int(environ.get("PHONIX_MAX_SESSIONS", "10000")),
+        "session_ttl": float(environ.get("PHONIX_SESSION_TTL", "1800")),
+    }
+
+def app_options(config):
+    return {"profiler": SlowRequestProfiler(**config["profile"]), "max_sessions": config["max_sessions"], "session_ttl": config["session_ttl"]}
+
+if __name__ == "__main__":
+    config = read_config()
+    if config["workers"] > 1:
+        serve_prefork(config)
+    else:
+        app = create_app(catalog_path=config["catalog_path"], reload_interval=config["reload_interval"], **app_options(config))
+        web.run_app(app, host=config["host"], port=config["port"])
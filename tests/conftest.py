@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules in utils/ import each other by bare name, as when run from that
+# directory; app.py is imported from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UTILS_DIR = os.path.join(ROOT, "utils")
+sys.path.insert(0, UTILS_DIR)
+sys.path.insert(0, ROOT)
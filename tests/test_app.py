@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from app import EXECUTOR_KEY, LOAD_KEY, create_app
+from recommender import load_dataset
+
+from conftest import UTILS_DIR
+
+BOUNDED = ["/recommend", "/facets", "/chat"]
+
+@pytest.fixture(scope="module")
+def df():
+    return load_dataset(os.path.join(UTILS_DIR, "tagged_dataset.csv"))
+
+def run(app, scenario):
+    # Runs scenario(client) against app on a test server
+    async def main():
+        async with TestClient(TestServer(app)) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+def test_ok(df):
+    async def scenario(client):
+        responses = {}
+        responses["/recommend"] = await client.post("/recommend", json={"prompt": "gaming phone under 30000", "top_n": 3})
+        responses["/facets"] = await client.get("/facets", params={"prompt": "camera phone", "budget": "20000"})
+        responses["/chat"] = await client.post("/chat", json={"prompt": "camera phone"})
+        for path in ["/health", "/stats", "/metrics", "/profiles"]:
+            responses[path] = await client.get(path)
+        chat = await responses["/chat"].json()
+        refined = await client.post("/chat", json={"prompt": "only Samsung", "session_id": chat["session_id"]})
+        return {path: response.status for path, response in responses.items()}, await responses["/recommend"].json(), chat, await refined.json()
+
+    statuses, recommended, chat, refined = run(create_app(df=df), scenario)
+    assert set(statuses.values()) == {200}
+    assert recommended["query"]["budget"] == 30000
+    assert 0 < len(recommended["results"]) <= 3
+    assert all(row["price"] <= 30000 for row in recommended["results"])
+    assert chat["mode"] == "new"
+    assert refined["mode"] == "refined" and refined["session_id"] == chat["session_id"]
+    assert all(row["brand"] == "Samsung" for row in refined["results"])
+
+def test_bad_request(df):
+    async def scenario(client):
+        requests = [
+            client.get("/recommend"),
+            client.post("/recommend", json={"prompt": "gaming phone", "top_n": "many"}),
+            client.post("/recommend", json={"prompt": "gaming phone", "top_n": 1000}),
+            client.post("/recommend", data="not json"),
+            client.get("/facets", params={"budget": "cheap"}),
+            client.post("/chat", json={"prompt": " "}),
+            client.post("/chat", json={"prompt": "gaming phone", "top_n": 0}),
+        ]
+        return [(await request).status for request in requests]
+
+    assert run(create_app(df=df), scenario) == [400] * 7
+
+def test_non_string_fields_are_bad_requests(df):
+    async def scenario(client):
+        requests = [
+            client.post("/recommend", json={"prompt": "gaming phone", "brand": 5}),
+            client.post("/chat", json={"prompt": "gaming phone", "brand": ["Samsung"]}),
+            client.post("/chat", json={"prompt": "gaming phone", "session_id": 7}),
+            client.post("/facets", json={"prompt": "gaming phone", "brand": True}),
+            client.post("/facets", json={"intent": {"camera": 1}}),
+        ]
+        responses = [await request for request in requests]
+        return [(response.status, (await response.json())["error"]) for response in responses]
+
+    assert run(create_app(df=df), scenario) == [
+        (400, "brand must be a string"),
+        (400, "brand must be a string"),
+        (400, "session_id must be a string"),
+        (400, "brand must be a string"),
+        (400, "intent must be a string"),
+    ]
+
+def test_too_many_requests(df):
+    async def scenario(client):
+        return [(await client.get(path, params={"prompt": "gaming phone"})).status for path in BOUNDED]
+
+    assert run(create_app(df=df, max_pending=0), scenario) == [429] * 3
+
+def test_timeout(df):
+    # With the only worker thread blocked, every bounded request waits past the timeout
+    app = create_app(df=df, max_workers=1, timeout=0.05)
+    gate = threading.Event()
+
+    async def scenario(client):
+        app[EXECUTOR_KEY].submit(gate.wait)
+        statuses = [(await client.get(path, params={"prompt": "gaming phone"})).status for path in BOUNDED]
+        pending = app[LOAD_KEY]["pending"]
+        gate.set()
+        await asyncio.sleep(0.5)
+        return statuses, pending, app[LOAD_KEY]["pending"]
+
+    statuses, pending, released = run(app, scenario)
+    assert statuses == [504] * 3
+    # Slots stay taken until the timed-out calls finish, then are released
+    assert pending == 3 and released == 0
@@ -0,0 +1,71 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from recommender import build_catalog, load_catalog, load_dataset, read_tagged_csv, get_catalog, feature_weights
+from catalog import Catalog
+from semantic import SemanticIndex, attach_semantic, build_semantic_index, semantic_path
+
+from conftest import UTILS_DIR
+
+def test_rebuilt_bundle_leaves_loaded_catalog_unchanged(tmp_path):
+    path = str(tmp_path / "tagged_dataset.csv")
+    shutil.copy(os.path.join(UTILS_DIR, "tagged_dataset.csv"), path)
+    build_catalog(path, force=True)
+    catalog = load_catalog(path)
+    prices, models = np.array(catalog.prices), np.array(catalog.result_columns["model"])
+
+    # A smaller catalog with different prices replaces every bundle file
+    df = pd.read_csv(path)
+    df.head(100).assign(price=1).to_csv(path, index=False)
+    build_catalog(path, force=True)
+
+    assert np.array_equal(catalog.prices, prices)
+    assert np.array_equal(catalog.result_columns["model"], models)
+    assert catalog.df["model"].tolist() == models.tolist()
+    assert len(load_catalog(path)) == 100
+
+def test_rebuilt_semantic_index_leaves_loaded_index_unchanged(tmp_path):
+    df = load_dataset(os.path.join(UTILS_DIR, "tagged_dataset.csv"))
+    path = semantic_path(str(tmp_path / "tagged_dataset.csv"))
+    build_semantic_index(df, path, dims=16)
+    index = SemanticIndex(path)
+    vectors = np.array(index.vectors)
+
+    build_semantic_index(df.head(100), path, dims=8)
+    assert np.array_equal(index.vectors, vectors)
+    assert SemanticIndex(path).rows == 100
+
+def test_semantic_index_is_left_off_a_reloaded_catalog_with_new_prices_or_tags(tmp_path):
+    df = load_dataset(os.path.join(UTILS_DIR, "tagged_dataset.csv"))
+    csv_path = str(tmp_path / "tagged_dataset.csv")
+    build_semantic_index(df, semantic_path(csv_path), dims=16)
+    assert attach_semantic(Catalog(df, feature_weights), csv_path) is not None
+
+    # Same models, different price or tags
+    repriced = df.assign(price=df["price"].where(df.index != 0, df["price"] + 1))
+    assert attach_semantic(Catalog(repriced, feature_weights), csv_path) is None
+    retagged = df.copy()
+    retagged.at[0, "tags"] = retagged.at[1, "tags"]
+    assert attach_semantic(Catalog(retagged, feature_weights), csv_path) is None
+
+def test_load_dataset_returns_the_csv_frame():
+    path = os.path.join(UTILS_DIR, "tagged_dataset.csv")
+    build_catalog(path)
+    df = load_dataset(path)
+    expected = read_tagged_csv(path)
+    # Missing values come back as NaN, not the string "nan"
+    pd.testing.assert_frame_equal(df, expected.reset_index(drop=True), check_dtype=False)
+    assert get_catalog(df, feature_weights) is not get_catalog(load_dataset(path), feature_weights)
+    assert len(get_catalog(df, feature_weights)) == len(expected)
+
+def test_rows_within_budget_is_a_price_ordered_range():
+    catalog = load_catalog(os.path.join(UTILS_DIR, "tagged_dataset.csv"))
+    for budget in [0, 5000, 20000, 10 ** 9]:
+        rows = catalog.index.rows_within_budget(budget)
+        assert sorted(rows.tolist()) == np.flatnonzero(catalog.prices <= budget).tolist()
+        # Price order, with rows at the same price in row order
+        assert np.all(np.diff(catalog.prices[rows]) >= 0)
+        assert rows.tolist() == sorted(rows.tolist(), key=lambda row: (catalog.prices[row], row))
@@ -0,0 +1,27 @@
+import io
+import json
+import os
+
+import pandas as pd
+
+from ingest import iter_json_chunks
+from tagger import tag_frame
+
+from conftest import ROOT
+
+def read_json_feed(records, chunk_size=100):
+    feed = io.BytesIO(json.dumps(records).encode("utf-8"))
+    return pd.concat(iter_json_chunks(feed, chunk_size), ignore_index=True)
+
+def test_json_record_tags_like_csv_row():
+    with open(os.path.join(ROOT, "datasets", "phones_data_formatted.json"), encoding="utf-8") as f:
+        records = json.load(f)
+    csv = pd.read_csv(os.path.join(ROOT, "final dataset.csv")).set_index("model")
+    frame = read_json_feed(records)
+    rows = csv.loc[frame["model"]].reset_index()
+
+    assert frame["memory card support"].tolist() == rows["memory card support"].tolist()
+    json_tags, csv_tags = tag_frame(frame), tag_frame(rows)
+    assert [("storage" in tags) for tags in json_tags] == [("storage" in tags) for tags in csv_tags]
+    # A record whose fields all read the same as its CSV row gets exactly its tags
+    assert sorted(json_tags[0]) == sorted(csv_tags[0])
@@ -0,0 +1,22 @@
+import pytest
+
+from parser import parse_query
+
+@pytest.mark.parametrize("prompt, expected", [
+    # "in" as an ordinary word is not a screen size
+    ("top 5 in india gaming phone", {}),
+    ("best 3 in 1 phone under 20k", {}),
+    ("6.5 in display phone", {"display_in": (6.3, 6.7)}),
+    ("6.7\" screen", {"display_in": (6.5, 6.9)}),
+    # A number is never read from the middle of a longer one
+    ("phone with 128gb ram", {"storage_gb": (128.0, None)}),
+    ("16.5 inch tablet", {}),
+    ("between 16 and 6.5 inch", {"display_in": (6.3, 6.7)}),
+    ("8gb ram 5000 mah under 6.5 inch", {"ram_gb": (8.0, None), "battery_mah": (5000.0, None), "display_in": (None, 6.5)}),
+])
+def test_spec_filters(prompt, expected):
+    assert dict(parse_query(prompt).spec_filters) == expected
+
+def test_in_is_not_a_unit_before_a_budget():
+    query = parse_query("best 3 in 1 phone under 20k")
+    assert query.budget == 20000
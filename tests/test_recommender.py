@@ -0,0 +1,135 @@
+import os
+import random
+
+import pytest
+
+from parser import SAMPLE_PROMPTS, INTENT_KEYWORDS, SUPPORTING_FEATURES, known_brands, parse_prompt, parse_query
+from recommender import load_catalog, load_dataset, recommend_phone, feature_weights, get_catalog, query_cache
+
+from conftest import UTILS_DIR
+
+# Reference scorer: the baseline recommend_phone, a per-row loop over the
+# DataFrame, kept as it was up to ranking. recommend_phone must return the same
+# phones, scores and matched features, except for these deliberate changes:
+#   1. Phones matching none of the requested features or intent are left out
+#      (the baseline scored them 0), unless none of those terms is a tag at all.
+#   2. Ties are broken by lower price, then model name, then row order; the
+#      baseline's unstable sort left their order unspecified.
+#   3. matched_features is compared sorted; the baseline listed a set.
+#   4. No phone passing the filters answers "No matching phones"; the
+#      baseline raised scoring an empty frame.
+# Spec filters did not exist in the baseline, so prompts with one are skipped.
+def reference_recommend(prompt, df, top_n=5, brand_filter=None):
+    parsed = parse_prompt(prompt)
+    intent = parsed.get("intent")
+    budget = parsed.get("budget")
+    features = set(parsed.get("supporting_features", []))
+
+    if not features:
+        features = set(parsed.get("keywords", []))
+
+    filtered_df = df.copy()
+
+    if brand_filter:
+        filtered_df = filtered_df[filtered_df['brand'].str.lower() == brand_filter.lower()]
+
+    if budget:
+        filtered_df = filtered_df[filtered_df['price'] <= budget]
+
+    if intent and not features:
+        filtered_df = filtered_df[filtered_df['tags'].apply(lambda tags: intent in tags)]
+
+    def compute_score(row):
+        tags = row['tags']
+        price = row['price']
+        matched = features.intersection(set(tags))
+        matched_score = sum(feature_weights.get(f, 1.0) for f in matched)
+        intent_bonus = feature_weights.get(intent, 1.0) if intent in tags else 0
+        total_possible = sum(feature_weights.get(f, 1.0) for f in features) + (feature_weights.get(intent, 1.0) if intent else 0)
+        final_score = (matched_score + intent_bonus) / total_possible if total_possible else 0
+
+        if "affordable" in features and price > 25000:
+            final_score *= 0.6
+
+        return int(final_score * 500), list(matched)
+
+    # 4. Nothing to score
+    if filtered_df.empty:
+        return "No matching phones found for your query."
+
+    scores_and_matches = filtered_df.apply(compute_score, axis=1)
+    filtered_df["match_score"] = [score for score, match in scores_and_matches]
+    filtered_df["matched_features"] = [match for score, match in scores_and_matches]
+
+    # 1. Only phones matching a requested term, when any term is a tag
+    all_tags = {tag for tags in df["tags"] for tag in tags}
+    if features & all_tags or (features and intent in all_tags):
+        matching = [bool(matched) or intent in tags for matched, tags in zip(filtered_df["matched_features"], filtered_df["tags"])]
+        filtered_df = filtered_df[matching]
+
+    if filtered_df.empty:
+        return "No matching phones found for your query."
+
+    # 2. Ties by price, then model name, then row order
+    filtered_df = filtered_df.assign(model_name=filtered_df["model"].astype(str))
+    if features or intent:
+        top_matches = filtered_df.sort_values(by=["match_score", "price", "model_name"], ascending=[False, True, True], kind="stable")
+        return [(model, score, sorted(matched)) for model, score, matched in zip(top_matches["model_name"][:top_n], top_matches["match_score"][:top_n], top_matches["matched_features"][:top_n])]
+    filtered_df["fallback_score"] = filtered_df["tags"].apply(lambda tags: sum(feature_weights.get(tag, 1.0) for tag in tags))
+    top_matches = filtered_df.sort_values(by=["fallback_score", "price", "model_name"], ascending=[False, True, True], kind="stable")
+    return [(model, round(score, 6), None) for model, score in zip(top_matches["model_name"][:top_n], top_matches["fallback_score"][:top_n])]
+
+def generated_prompts(count, seed=0):
+    # Keyword phrases with budgets and brands, in the shapes users type them
+    rng = random.Random(seed)
+    phrases = [keyword for keywords in list(INTENT_KEYWORDS.values()) + list(SUPPORTING_FEATURES.values()) for keyword in keywords]
+    templates = ["{0} phone", "phone with {0} and {1}", "{0} phone under {2}", "{3} phone with {0}", "best {3} for {0} under {2}", "{0} {1} {2}"]
+    prompts = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        prompts.append(template.format(rng.choice(phrases), rng.choice(phrases), rng.randrange(5, 150) * 1000, rng.choice(known_brands)))
+    return prompts
+
+@pytest.fixture(scope="module")
+def df():
+    return load_dataset(os.path.join(UTILS_DIR, "tagged_dataset.csv"))
+
+def test_vectorized_scoring_matches_reference_loop(df):
+    # Spec constraints have no counterpart in the reference loop, so those prompts are skipped
+    prompts = [prompt for prompt in SAMPLE_PROMPTS + generated_prompts(300) if not parse_query(prompt).spec_filters]
+    for i, prompt in enumerate(prompts):
+        brand = parse_query(prompt).brand if i % 2 else None
+        top_n = 5 + i % 7
+        expected = reference_recommend(prompt, df, top_n, brand)
+        result = recommend_phone(prompt, df, top_n=top_n, brand_filter=brand, use_cache=False, semantic_weight=0)
+        if isinstance(expected, str):
+            assert result == expected, prompt
+            continue
+        score_column = "match_score" if "match_score" in result else "fallback_score"
+        matched = [sorted(features) for features in result["matched_features"]] if "matched_features" in result else [None] * len(result)
+        scores = [round(float(score), 6) for score in result[score_column]]
+        assert list(zip(result["model"].astype(str), scores, matched)) == expected, prompt
+
+def test_untagged_terms_fall_back_to_filtered_rows(df):
+    # Neither prompt names a term that is a tag; every phone passing the filters is a candidate
+    for prompt in ["Affordable phone for daily use", "Compact phone under 6.2 inches with 128GB storage"]:
+        assert prompt in SAMPLE_PROMPTS
+        result = recommend_phone(prompt, df, use_cache=False)
+        assert not isinstance(result, str), prompt
+        assert len(result) == 5 and (result["match_score"] == 0).all()
+
+    catalog = get_catalog(df, feature_weights)
+    query = parse_query("Compact phone under 6.2 inches with 128GB storage")
+    result = recommend_phone(query, df, top_n=100, use_cache=False)
+    assert len(result) == int(catalog.spec_mask(dict(query.spec_filters)).sum()) == 42
+
+def test_query_cache_keeps_entries_of_each_live_catalog():
+    # Two catalogs served at once, such as the old and new one during a reload
+    path = os.path.join(UTILS_DIR, "tagged_dataset.csv")
+    old, new = load_catalog(path), load_catalog(path)
+    query_cache.clear()
+    results = [recommend_phone("gaming phone under 30000", catalog) for catalog in [old, new, old, new]]
+    stats = query_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 2, 2)
+    assert all(result.equals(results[0]) for result in results)
+
@@ -0,0 +1,27 @@
+import os
+
+from recommender import load_dataset
+from session import SessionStore, converse
+
+from conftest import UTILS_DIR
+
+def test_follow_up_across_reload():
+    path = os.path.join(UTILS_DIR, "tagged_dataset.csv")
+    df = load_dataset(path)
+    store = SessionStore()
+    session_id, _, _, mode = converse(store, None, "camera phone under 30000", df)
+    assert mode == "new"
+
+    # A reload gets a new catalog version, so the follow-up rebuilds the
+    # candidates but still applies its own constraints
+    reloaded = load_dataset(path)
+    _, state, result, mode = converse(store, session_id, "only Samsung", reloaded)
+    assert mode == "rebuilt"
+    assert state["brand"] == "Samsung" and state["budget"] == 30000
+    assert len(result) and (result["brand"] == "Samsung").all()
+    assert (result["price"] <= 30000).all()
+
+    # Later turns refine against the new catalog
+    _, state, result, mode = converse(store, session_id, "with 5g", reloaded)
+    assert mode == "refined" and "connectivity" in state["features"]
+    assert len(result) and (result["brand"] == "Samsung").all()
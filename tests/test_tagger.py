@@ -0,0 +1,71 @@
+import ast
+import os
+
+import pandas as pd
+
+from recommender import read_tagged_csv
+from tagger import tag_phone, tag_frame, tag_dataset, retag_incremental
+
+from conftest import ROOT, UTILS_DIR
+
+# The vectorized tagger must give every row exactly the tags, in the same
+# order, that the per-row path gives it
+def test_tag_frame_matches_tag_phone():
+    df = pd.read_csv(os.path.join(ROOT, "final dataset.csv"))
+    expected = [tag_phone(row) for _, row in df.iterrows()]
+    assert tag_frame(df) == expected
+    # Chunked across worker processes, as large frames are
+    assert tag_dataset(df, workers=2, chunk_size=97).tolist() == expected
+
+# tagged_dataset.csv was written by the original per-row tagger; its tag lists
+# came from a set, so only their contents are compared
+def test_tags_match_committed_dataset():
+    df = pd.read_csv(os.path.join(ROOT, "final dataset.csv"))
+    tagged = pd.read_csv(os.path.join(UTILS_DIR, "tagged_dataset.csv"))
+    assert tagged["model"].tolist() == df["model"].tolist()
+    committed = [sorted(ast.literal_eval(tags)) for tags in tagged["tags"]]
+    assert [sorted(tags) for tags in tag_frame(df)] == committed
+    assert [sorted(tag_phone(row)) for _, row in df.iterrows()] == committed
+
+def test_compiled_rules_are_reused():
+    from tagger import TAG_RULES, add_spec_tags, compiled_rules, COMPILED_RULES_LIMIT
+    row = pd.read_csv(os.path.join(ROOT, "final dataset.csv")).iloc[0]
+    for _ in range(50):
+        add_spec_tags(row)
+        tag_phone(row)
+    # The module's own rules never go through the cache
+    assert len(compiled_rules) == 0
+    # Other rule lists are compiled once per distinct content, and only so many are kept
+    for _ in range(50):
+        add_spec_tags(row, rules=[dict(rule) for rule in TAG_RULES])
+    assert len(compiled_rules) == 1
+    for threshold in range(COMPILED_RULES_LIMIT * 2):
+        tag_phone(row, rules=[{"tag": "big battery", "when": {"number": "battery", "min": threshold}}])
+    assert len(compiled_rules) == COMPILED_RULES_LIMIT
+
+def test_incremental_run_appends_only_changed_rows(tmp_path):
+    source = pd.read_csv(os.path.join(ROOT, "final dataset.csv")).head(50)
+    output, cache = str(tmp_path / "tagged.csv"), str(tmp_path / "tagged.csv.tagcache.json")
+    full = str(tmp_path / "full.csv")
+    assert retag_incremental(source, cache, output_path=output)[1]["compacted"]
+
+    # A price update and a new phone are appended; the rest of the file is left as it was
+    size = os.path.getsize(output)
+    updated = source.copy()
+    updated.loc[3, "price"] = "1,999"
+    updated = pd.concat([updated, source.tail(1).assign(model="New Phone")], ignore_index=True)
+    tags, report = retag_incremental(updated, cache, output_path=output)
+    assert not report["compacted"] and len(report["stale_rows"]) == 2
+    with open(output, encoding="utf-8") as f:
+        head = f.read(size)
+    with open(full, "w", encoding="utf-8", newline="") as f:
+        source.assign(tags=tag_dataset(source)).to_csv(f, index=False)
+    with open(full, encoding="utf-8") as f:
+        assert head == f.read()
+    updated.assign(tags=tags).to_csv(full, index=False)
+    pd.testing.assert_frame_equal(read_tagged_csv(output), read_tagged_csv(full))
+
+    # Removing a phone compacts the file
+    assert retag_incremental(updated.drop(index=5), cache, output_path=output)[1]["compacted"]
+    assert len(pd.read_csv(output)) == len(updated) - 1
+
@@ -0,0 +1,163 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from parser import parse_prompt, SAMPLE_PROMPTS
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+REQUESTS_PATH = os.path.join(UTILS_DIR, "..", "requests.jsonl")
+SOURCE_PATH = os.path.join(UTILS_DIR, "..", "final dataset.csv")
+TAGGED_PATH = os.path.join(UTILS_DIR, "tagged_dataset.csv")
+BASELINE_PATH = os.path.join(UTILS_DIR, "benchmark_baseline.json")
+CATALOG_SCALES = [1, 10, 100]
+
+def load_logged_prompts(path=REQUESTS_PATH):
+    prompts = []
+    if not os.path.exists(path):
+        return prompts
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                prompts.extend([record.get("title", ""), record.get("body", "")])
+    return prompts
+
+def throughput(fn, items, min_time=1.0):
+    # Calls fn on every item repeatedly for at least min_time seconds, returns items/sec
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for item in items:
+            fn(item)
+        count += len(items)
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+def bench_parse_prompt():
+    results = {"parse_prompt samples (prompts/sec)": throughput(parse_prompt, SAMPLE_PROMPTS)}
+    logged = load_logged_prompts()
+    if logged:
+        results["parse_prompt requests.jsonl (prompts/sec)"] = throughput(parse_prompt, logged)
+    return results
+
+def latencies(fn, items, min_time=1.0, min_calls=200):
+    # Times single calls of fn over items, returns a list of seconds per call
+    samples = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time or len(samples) < min_calls:
+        for item in items:
+            begin = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - begin)
+    return samples
+
+def bench_tagger():
+    from tagger import tag_phone, tag_dataset
+    df = pd.read_csv(SOURCE_PATH)
+    rows = [row for _, row in df.iterrows()]
+    return {
+        "tag_phone (rows/sec)": throughput(tag_phone, rows),
+        "tag_dataset (rows/sec)": throughput(lambda frame: tag_dataset(frame, workers=1), [df]) * len(df),
+    }
+
+def bench_load_dataset(repeat=3):
+    # Cold start is measured in a fresh interpreter each time, imports included
+    script = (
+        "import time; start = time.perf_counter()\n"
+        "from recommender import load_dataset, get_catalog, feature_weights\n"
+        "get_catalog(load_dataset(%r), feature_weights)\n"
+        "print(time.perf_counter() - start)" % TAGGED_PATH
+    )
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], cwd=UTILS_DIR, capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return {"load_dataset cold start (ms)": min(timings) * 1000}
+
+def scaled_catalog(df, scale):
+    # Copies of the tagged catalog with distinct model names and jittered prices
+    if scale == 1:
+        return df
+    rng = np.random.default_rng(scale)
+    copies = []
+    for copy in range(scale):
+        part = df.copy()
+        part["model"] = part["model"].astype(str) + f" #{copy}"
+        part["price"] = (part["price"] * rng.uniform(0.8, 1.2, len(part))).round()
+        copies.append(part)
+    return pd.concat(copies, ignore_index=True)
+
+def bench_recommend(scales=CATALOG_SCALES):
+    from recommender import load_dataset, get_catalog, recommend_phone, feature_weights
+    df = load_dataset(TAGGED_PATH)
+    results = {}
+    for scale in scales:
+        catalog = get_catalog(scaled_catalog(df, scale), feature_weights)
+        samples = latencies(lambda prompt: recommend_phone(prompt, catalog, use_cache=False), SAMPLE_PROMPTS, min_calls=50)
+        results[f"recommend_phone {scale}x p50 (ms)"] = np.percentile(samples, 50) * 1000
+        results[f"recommend_phone {scale}x p99 (ms)"] = np.percentile(samples, 99) * 1000
+    return results
+
+def run_all():
+    results = {}
+    results.update(bench_parse_prompt())
+    results.update(bench_tagger())
+    results.update(bench_load_dataset())
+    results.update(bench_recommend())
+    return results
+
+# Regression check
+# Metric names ending in "(ms)" or "(MB)" are lower-is-better; the rest are rates.
+# A metric regresses when it is worse than the saved baseline by more than tolerance.
+def lower_is_better(name):
+    return name.endswith(("(ms)", "(MB)"))
+
+def find_regressions(results, baseline, tolerance=0.2):
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if lower_is_better(name):
+            worse = value > base * (1 + tolerance)
+        else:
+            worse = value < base * (1 - tolerance)
+        if worse:
+            regressions.append((name, base, value))
+    return regressions
+
+def print_results(results, baseline=None):
+    for name, value in results.items():
+        line = f"{name:<50}: {value:,.2f}" if lower_is_better(name) else f"{name:<50}: {value:,.0f}"
+        if baseline and baseline.get(name):
+            line += f"  ({(value - baseline[name]) / baseline[name]:+.0%} vs baseline)"
+        print(line)
+
+if __name__ == "__main__":
+    # python benchmark.py [--save-baseline | --check [--tolerance 0.2]]
+    tolerance = float(sys.argv[sys.argv.index("--tolerance") + 1]) if "--tolerance" in sys.argv else 0.2
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run_all()
+    print_results(results, baseline)
+
+    if "--save-baseline" in sys.argv:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {BASELINE_PATH}")
+    elif "--check" in sys.argv:
+        if baseline is None:
+            sys.exit(f"No baseline at {BASELINE_PATH}, run with --save-baseline first")
+        regressions = find_regressions(results, baseline, tolerance)
+        for name, base, value in regressions:
+            print(f"REGRESSION {name}: {base:,.2f} -> {value:,.2f}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Bounded LRU cache with optional TTL and hit/miss counters.
+# Keys are scoped to a catalog version, so catalogs that are live at the same
+# time (the old and new one during a reload, or a session's snapshot) each
+# keep their own entries; those of a retired catalog age out through the LRU.
+class QueryCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, version, key):
+        with self.lock:
+            entry = self.entries.get((version, key))
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self.entries.move_to_end((version, key))
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[(version, key)]
+            self.misses += 1
+            return None
+
+    def put(self, version, key, value, query=None):
+        # query holds the arguments that produced value, so it can be recomputed
+        with self.lock:
+            self.store(version, key, value, query, time.monotonic())
+
+    def store(self, version, key, value, query, now):
+        self.entries[(version, key)] = (now, value, query)
+        self.entries.move_to_end((version, key))
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def recent_queries(self, version, limit=None):
+        # (key, query) pairs of one catalog version, most recently used first
+        with self.lock:
+            items = [(key, entry[2]) for (entry_version, key), entry in reversed(self.entries.items()) if entry_version == version and entry[2] is not None]
+        return items[:limit] if limit is not None else items
+
+    def fill(self, version, values):
+        # Adds already computed entries for a new catalog version, most recent first
+        with self.lock:
+            now = time.monotonic()
+            for key, (value, query) in reversed(list(values.items())):
+                self.store(version, key, value, query, now)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+            }
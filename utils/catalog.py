@@ -0,0 +1,436 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import weakref
+from functools import cached_property
+import numpy as np
+import pandas as pd
+
+from specs import parse_specs, spec_mask, known_values, typed_bounds
+
+BUNDLE_VERSION = 3
+catalog_versions = itertools.count(1)
+
+RESULT_COLUMNS = ["brand", "model", "price", "tags"]
+
+def read_only(array):
+    array = np.asarray(array)
+    if array.flags.writeable:
+        array.setflags(write=False)
+    return array
+
+def pack_bits(mask):
+    # Packs a boolean array along its last axis into uint64 words, zero-padded
+    packed = np.packbits(mask, axis=-1)
+    padding = [(0, 0)] * (packed.ndim - 1) + [(0, -packed.shape[-1] % 8)]
+    return np.ascontiguousarray(np.pad(packed, padding)).view(np.uint64)
+
+# Array-backed view of a tagged dataset, built once per loaded DataFrame.
+# Each row's tags become a multi-hot row in tag_matrix (one column per tag)
+# so scoring is a matrix-vector product and filters are boolean masks.
+# Specs are parsed once into typed arrays (specs.parse_specs) for numeric filters.
+# A catalog is immutable once built: its arrays are read-only and queries
+# only ever index into them, so one instance can be shared across threads.
+class Catalog:
+    def __init__(self, df, weights, tag_names=None, tag_matrix=None, model_ranks=None, specs=None, spec_categories=None):
+        self.df = df.reset_index(drop=True)
+        self.frame_loader = None
+        self.weights = weights
+        # Unique per catalog instance; caches keyed on it go stale when the data changes
+        self.version = next(catalog_versions)
+
+        if tag_matrix is None:
+            tags = self.df["tags"].tolist()
+            tag_names = sorted({tag for row_tags in tags for tag in row_tags})
+            tag_ids = {tag: i for i, tag in enumerate(tag_names)}
+            tag_matrix = np.zeros((len(tags), len(tag_names)), dtype=np.uint8)
+            for row, row_tags in enumerate(tags):
+                for tag in row_tags:
+                    tag_matrix[row, tag_ids[tag]] = 1
+        self.tag_names = list(tag_names)
+        self.tag_ids = {tag: i for i, tag in enumerate(self.tag_names)}
+        self.tag_matrix = read_only(tag_matrix)
+        self.tag_weights = np.array([weights.get(tag, 1.0) for tag in self.tag_names])
+
+        self.prices = read_only(self.df["price"].to_numpy())
+        self.brands = read_only(self.df["brand"].str.lower().to_numpy())
+        # Position of each model name in sorted order, used as a numeric tie-break
+        if model_ranks is None:
+            model_ranks = np.unique(self.df["model"].astype(str).to_numpy(), return_inverse=True)[1]
+        self.model_ranks = read_only(model_ranks)
+        # Columns shown in results, so top rows are gathered without touching the frame
+        self.result_columns = {name: read_only(self.df[name].to_numpy(dtype=object)) for name in RESULT_COLUMNS}
+        self.result_columns["price"] = self.prices
+
+        if specs is None:
+            specs, spec_categories = parse_specs(self.df)
+        self.specs = {name: read_only(values) for name, values in specs.items()}
+        self.spec_categories = spec_categories
+        # Optional semantic.SemanticIndex over the same rows, attached after load
+        self.semantic = None
+
+    @cached_property
+    def index(self):
+        return TagIndex(self)
+
+    @cached_property
+    def df(self):
+        # Catalogs built from arrays have no frame; a bundle's is read back only when asked for
+        return self.frame_loader() if self.frame_loader else None
+
+    @cached_property
+    def fallback_scores(self):
+        # Summed in each row's own tag order so values match the per-row sum exactly
+        return read_only([sum(self.weights.get(tag, 1.0) for tag in row_tags) for row_tags in self.df["tags"]])
+
+    @cached_property
+    def tag_bitmaps(self):
+        # One bit row per tag (bit i set when row i has the tag), packed into 64-bit words
+        return read_only(pack_bits(self.tag_matrix.T.astype(bool)))
+
+    def __len__(self):
+        return len(self.prices)
+
+    def shared_arrays(self):
+        # Every array a query needs, plus the names they refer to; a catalog
+        # rebuilt from these with from_arrays never needs the DataFrame
+        tags = self.result_columns["tags"]
+        if isinstance(tags, TagLists):
+            tag_offsets, tag_codes = tags.offsets, tags.codes
+        else:
+            tag_offsets = np.cumsum([0] + [len(row_tags) for row_tags in tags], dtype=np.int64)
+            tag_codes = np.array([self.tag_ids[tag] for row_tags in tags for tag in row_tags], dtype=np.int32)
+        index = self.index
+        posting_lists = [index.postings[tag] for tag in self.tag_names]
+        brand_names = sorted(index.brand_postings)
+        brand_lists = [index.brand_postings[brand] for brand in brand_names]
+        arrays = {
+            "tag_matrix": self.tag_matrix,
+            "prices": self.prices,
+            "brands": self.brands.astype(str),
+            "model_ranks": self.model_ranks,
+            "fallback_scores": self.fallback_scores,
+            "brand": self.result_columns["brand"].astype(str),
+            "model": self.result_columns["model"].astype(str),
+            "tag_offsets": tag_offsets,
+            "tag_codes": tag_codes,
+            "posting_offsets": np.cumsum([0] + [len(rows) for rows in posting_lists], dtype=np.int64),
+            "posting_rows": np.concatenate(posting_lists + [index.all_rows[:0]]),
+            "brand_offsets": np.cumsum([0] + [len(rows) for rows in brand_lists], dtype=np.int64),
+            "brand_rows": np.concatenate(brand_lists + [index.all_rows[:0]]),
+        }
+        arrays.update({"spec_" + name: values for name, values in self.specs.items()})
+        return arrays, {"tag_names": self.tag_names, "brand_names": brand_names, "spec_categories": self.spec_categories}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta, weights):
+        catalog = cls.__new__(cls)
+        catalog.frame_loader = None
+        catalog.weights = weights
+        catalog.version = next(catalog_versions)
+        catalog.tag_names = list(meta["tag_names"])
+        catalog.tag_ids = {tag: i for i, tag in enumerate(catalog.tag_names)}
+        catalog.tag_matrix = read_only(arrays["tag_matrix"])
+        catalog.tag_weights = np.array([weights.get(tag, 1.0) for tag in catalog.tag_names])
+        catalog.prices = read_only(arrays["prices"])
+        catalog.brands = read_only(arrays["brands"])
+        catalog.model_ranks = read_only(arrays["model_ranks"])
+        catalog.result_columns = {
+            "brand": read_only(arrays["brand"]),
+            "model": read_only(arrays["model"]),
+            "price": catalog.prices,
+            "tags": TagLists(read_only(arrays["tag_offsets"]), read_only(arrays["tag_codes"]), catalog.tag_names),
+        }
+        catalog.specs = {name[len("spec_"):]: read_only(values) for name, values in arrays.items() if name.startswith("spec_")}
+        catalog.spec_categories = meta["spec_categories"]
+        catalog.semantic = None
+        # Pre-fill the lazy attributes so nothing is recomputed from the arrays
+        catalog.__dict__["fallback_scores"] = read_only(arrays["fallback_scores"])
+        catalog.__dict__["index"] = TagIndex.from_arrays(len(catalog), arrays, meta)
+        return catalog
+
+    def rows_frame(self, rows, **extra):
+        # Materializes only the given rows as a new DataFrame
+        data = {name: values[rows] for name, values in self.result_columns.items()}
+        data.update(extra)
+        return pd.DataFrame(data)
+
+    def spec_mask(self, filters, rows=None):
+        # Boolean mask over rows (or the whole catalog) of phones meeting every spec filter
+        return spec_mask(self.specs, self.spec_categories, filters, rows)
+
+    def tag_column(self, tag):
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            return np.zeros(len(self), dtype=np.uint8)
+        return self.tag_matrix[:, tag_id]
+
+# Row tag lists stored as flat tag IDs plus per-row offsets; indexing with an
+# array of rows builds Python lists for just those rows
+class TagLists:
+    def __init__(self, offsets, codes, tag_names):
+        self.offsets = offsets
+        self.codes = codes
+        self.tag_names = tag_names
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, rows):
+        lists = np.empty(len(rows), dtype=object)
+        for i, row in enumerate(rows):
+            lists[i] = [self.tag_names[code] for code in self.codes[self.offsets[row]:self.offsets[row + 1]]]
+        return lists
+
+# Inverted index over a catalog for candidate retrieval.
+# Every tag and brand maps to a sorted posting list of row IDs. Rows are also
+# kept in price order, so a budget over the whole catalog is a binary search;
+# over a smaller candidate set it is a price mask. Numeric spec columns keep the
+# rows with a known value in value order, so a range is a binary search too.
+def spec_orders(specs, spec_categories):
+    orders, sorted_values = {}, {}
+    for name, values in specs.items():
+        if name in spec_categories:
+            continue
+        known = np.flatnonzero(known_values(values))
+        order = known[np.argsort(values[known], kind="stable")].astype(np.int32)
+        orders[name] = read_only(order)
+        sorted_values[name] = read_only(values[order])
+    return orders, sorted_values
+
+def price_order(prices):
+    # Stable, so rows at the same price stay in row order
+    order = np.argsort(prices, kind="stable").astype(np.int32)
+    return read_only(order), read_only(prices[order])
+
+class TagIndex:
+    def __init__(self, catalog):
+        self.all_rows = read_only(np.arange(len(catalog), dtype=np.int32))
+        self.postings = {
+            tag: read_only(np.flatnonzero(catalog.tag_matrix[:, tag_id]).astype(np.int32))
+            for tag, tag_id in catalog.tag_ids.items()
+        }
+        brand_codes, brand_rows = np.unique(catalog.brands.astype(str), return_inverse=True)
+        self.brand_postings = {
+            brand: read_only(np.flatnonzero(brand_rows == code).astype(np.int32))
+            for code, brand in enumerate(brand_codes)
+        }
+        self.price_order, self.sorted_prices = price_order(catalog.prices)
+        self.spec_orders, self.spec_sorted = spec_orders(catalog.specs, catalog.spec_categories)
+
+    @classmethod
+    def from_arrays(cls, rows, arrays, meta):
+        def split(offsets, flat, names):
+            return {name: flat[offsets[i]:offsets[i + 1]] for i, name in enumerate(names)}
+
+        index = cls.__new__(cls)
+        index.all_rows = read_only(np.arange(rows, dtype=np.int32))
+        index.postings = split(arrays["posting_offsets"], read_only(arrays["posting_rows"]), meta["tag_names"])
+        index.brand_postings = split(arrays["brand_offsets"], read_only(arrays["brand_rows"]), meta["brand_names"])
+        specs = {name[len("spec_"):]: values for name, values in arrays.items() if name.startswith("spec_")}
+        index.price_order, index.sorted_prices = price_order(arrays["prices"])
+        index.spec_orders, index.spec_sorted = spec_orders(specs, meta["spec_categories"])
+        return index
+
+    def posting(self, tag):
+        return self.postings.get(tag, self.all_rows[:0])
+
+    def any_of(self, tags):
+        lists = [self.postings[tag] for tag in tags if tag in self.postings]
+        if not lists:
+            return self.all_rows[:0]
+        if len(lists) == 1:
+            return lists[0]
+        hits = np.zeros(len(self.all_rows), dtype=bool)
+        for rows in lists:
+            hits[rows] = True
+        return np.flatnonzero(hits).astype(np.int32)
+
+    def brand_rows(self, brand):
+        return self.brand_postings.get(brand.lower(), self.all_rows[:0])
+
+    def rows_within_budget(self, budget):
+        # Rows priced at most budget, in price order (not row order)
+        end = np.searchsorted(self.sorted_prices, budget, side="right")
+        return self.price_order[:end]
+
+    def spec_range(self, name, low=None, high=None):
+        # Rows whose spec lies in [low, high], in value order (not row order)
+        sorted_values = self.spec_sorted[name]
+        low, high = typed_bounds(sorted_values.dtype, low, high)
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+        end = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side="right")
+        return self.spec_orders[name][start:end]
+
+def intersect_rows(rows, other):
+    if len(rows) > 8 * len(other) or len(other) > 8 * len(rows):
+        small, large = (rows, other) if len(rows) < len(other) else (other, rows)
+        found = np.searchsorted(large, small)
+        found[found == len(large)] = 0
+        return small[large[found] == small] if len(large) else large
+    return np.intersect1d(rows, other, assume_unique=True)
+
+# Catalogs are cached per DataFrame object and dropped when the frame is collected
+catalog_cache = {}
+catalog_lock = threading.Lock()
+
+def register_catalog(df, catalog):
+    # Makes get_catalog(df) return an already built catalog for df
+    with catalog_lock:
+        catalog_cache[id(df)] = (weakref.ref(df), catalog)
+    weakref.finalize(df, catalog_cache.pop, id(df), None)
+
+def get_catalog(df, weights):
+    if isinstance(df, Catalog):
+        return df
+    entry = catalog_cache.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    with catalog_lock:
+        entry = catalog_cache.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        catalog = Catalog(df, weights)
+        # Build the lazy index up front so concurrent queries never race to create it
+        catalog.index
+        catalog.fallback_scores
+        catalog_cache[id(df)] = (weakref.ref(df), catalog)
+    weakref.finalize(df, catalog_cache.pop, id(df), None)
+    return catalog
+
+# Compiled catalog bundle
+# A directory of .npy files next to the source CSV ("tagged_dataset.csv.catalog/")
+# that np.load can memory-map: typed numeric columns, fixed-width string columns,
+# the tag matrix, each row's tag IDs in their original order, and the typed spec
+# arrays. meta.json is written last and records the source file's size, mtime
+# and hash. Every file is written beside its target and renamed over it, so a
+# catalog that has the old files memory-mapped keeps reading the old data.
+def bundle_path(csv_path):
+    return str(csv_path) + ".catalog"
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_bundle_meta(bundle):
+    try:
+        with open(os.path.join(bundle, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == BUNDLE_VERSION else None
+
+def bundle_is_fresh(bundle, csv_path):
+    meta = read_bundle_meta(bundle)
+    if meta is None or not os.path.exists(csv_path):
+        return False
+    if meta["source"] == file_signature(csv_path):
+        return True
+    # Touched but possibly unchanged: fall back to comparing content hashes
+    return meta["source_hash"] == file_hash(csv_path)
+
+def save_array(directory, name, array):
+    path = os.path.join(directory, name + ".npy")
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(path + ".tmp", path)
+
+def write_bundle(catalog, bundle, csv_path):
+    os.makedirs(bundle, exist_ok=True)
+    meta_file = os.path.join(bundle, "meta.json")
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+
+    def save(name, array):
+        save_array(bundle, name, array)
+
+    # The frame's own columns, read back only when a caller needs catalog.df
+    columns = []
+    for i, name in enumerate(catalog.df.columns):
+        if name == "tags":
+            continue
+        series = catalog.df[name]
+        key = f"col_{i:02d}"
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            save(key, series.to_numpy())
+            columns.append({"name": name, "key": key, "kind": "numeric"})
+        else:
+            nulls = series.isna().to_numpy()
+            save(key, series.fillna("").astype(str).to_numpy(dtype=str))
+            if nulls.any():
+                save(key + "_null", nulls)
+            columns.append({"name": name, "key": key, "kind": "string", "nulls": bool(nulls.any())})
+
+    # Everything queries use, in the form Catalog.from_arrays takes
+    arrays, shared_meta = catalog.shared_arrays()
+    for name, values in arrays.items():
+        save(name, values)
+
+    meta = {
+        "version": BUNDLE_VERSION,
+        "rows": len(catalog),
+        "columns": columns,
+        "arrays": list(arrays),
+        **shared_meta,
+        "source": file_signature(csv_path),
+        "source_hash": file_hash(csv_path),
+    }
+    with open(meta_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_file + ".tmp", meta_file)
+
+def load_bundle_array(bundle, name):
+    return np.load(os.path.join(bundle, name + ".npy"), mmap_mode="r")
+
+def load_bundle_frame(arrays, meta):
+    data = {column["name"]: arrays[column["key"]] for column in meta["columns"]}
+
+    tag_names = meta["tag_names"]
+    offsets = arrays["tag_offsets"].tolist()
+    codes = [tag_names[code] for code in arrays["tag_codes"].tolist()]
+    data["tags"] = [codes[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    df = pd.DataFrame(data)
+    string_columns = [column["name"] for column in meta["columns"] if column["kind"] == "string"]
+    df[string_columns] = df[string_columns].astype("str")
+    # Missing values are restored after the cast, which would turn them into "nan"
+    for column in meta["columns"]:
+        if column["kind"] == "string" and column["nulls"]:
+            df.loc[arrays[column["key"] + "_null"], column["name"]] = np.nan
+    return df
+
+def load_bundle(bundle, weights):
+    # The catalog's arrays stay memory-mapped: result rows gather brand, model and
+    # tag lists from them (TagLists) and the DataFrame is only built for catalog.df.
+    # Every file is mapped up front, so a later rebuild of the bundle never shows
+    # through; None when the bundle is missing or was rewritten while being mapped.
+    meta = read_bundle_meta(bundle)
+    if meta is None:
+        return None
+    names = list(meta["arrays"])
+    for column in meta["columns"]:
+        names += [column["key"]] + ([column["key"] + "_null"] if column.get("nulls") else [])
+    try:
+        arrays = {name: load_bundle_array(bundle, name) for name in names}
+    except (OSError, ValueError):
+        return None
+    if read_bundle_meta(bundle) != meta:
+        return None
+    catalog = Catalog.from_arrays({name: arrays[name] for name in meta["arrays"]}, meta, weights)
+    catalog.frame_loader = lambda: load_bundle_frame(arrays, meta)
+    return catalog
+
+if __name__ == "__main__":
+    import sys
+    from recommender import build_catalog
+    path = sys.argv[1] if len(sys.argv) > 1 else "tagged_dataset.csv"
+    print(f"Catalog bundle ready: {build_catalog(path)}")
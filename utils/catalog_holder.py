@@ -0,0 +1,83 @@
+import threading
+import traceback
+
+from catalog import file_signature
+from recommender import load_catalog, query_cache, run_query
+from semantic import attach_semantic
+
+# Keeps the live catalog and swaps in a new one when the tagged file changes.
+# Readers take `holder.current` once per request and keep using that snapshot,
+# so a reload never blocks or changes a query that is already running.
+# The new catalog and its index are built on the watcher thread; before the
+# swap the most recently used cached queries are recomputed against it, so the
+# cache is still warm when the first request sees the new data.
+class CatalogHolder:
+    def __init__(self, path, poll_interval=2.0, warm_limit=256):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.warm_limit = warm_limit
+        self.signature = file_signature(path)
+        self.pending = None
+        self.current = self.load()
+        self.reloads = 0
+        self.last_error = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def load(self):
+        # A semantic index built for an older version of the file no longer matches and is left off
+        catalog = load_catalog(self.path)
+        attach_semantic(catalog, self.path)
+        return catalog
+
+    def check(self):
+        # A changed file is only reloaded once it has looked the same for a full
+        # poll interval, so a file that is still being written is not picked up
+        signature = file_signature(self.path)
+        if signature == self.signature:
+            self.pending = None
+            return False
+        if signature != self.pending:
+            self.pending = signature
+            return False
+        self.reload(signature)
+        return True
+
+    def reload(self, signature=None):
+        signature = signature or file_signature(self.path)
+        catalog = self.load()
+        warmed = {}
+        for key, query in query_cache.recent_queries(self.current.version, self.warm_limit):
+            warmed[key] = (run_query(catalog, *query), query)
+        # Cache first, then the catalog; the old snapshot keeps its own entries
+        query_cache.fill(catalog.version, warmed)
+        self.current = catalog
+        self.signature = signature
+        self.pending = None
+        self.reloads += 1
+        return catalog
+
+    def watch(self):
+        while not self.stopped.wait(self.poll_interval):
+            try:
+                self.check()
+                self.last_error = None
+            except Exception:
+                # Keep serving the old catalog and try again on the next poll
+                self.last_error = traceback.format_exc(limit=1)
+                self.pending = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.watch, name="catalog-reload", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def stats(self):
+        return {"version": self.current.version, "phones": len(self.current), "reloads": self.reloads, "last_error": self.last_error}
@@ -0,0 +1,180 @@
+import argparse
+import re
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from ingest import normalize_frame
+
+# Dedup and merge of phone listings
+# Brand and model strings are normalized into a token key, so "Xiaomi Redmi
+# Note 10S (6GB RAM + 128GB)" and "Redmi Note 10S 6 GB 128 GB" share a key and
+# are merged directly. Misspelt names ("Samsung Galxy A04") are found with
+# MinHash over character shingles and LSH banding: only keys that share a band
+# bucket are compared, so the pass stays close to linear in the number of rows.
+MISSING_VALUES = ["", "not specified", "nan", "none", "n/a", "-"]
+
+# Words that do not tell two models apart
+NOISE_TOKENS = {"ram", "dual", "sim", "smartphone", "mobile", "phone"}
+
+# Sub-brands that are sold as their parent brand
+BRAND_GROUPS = {"redmi": "xiaomi", "poco": "xiaomi", "iqoo": "vivo", "letv": "leeco"}
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 32
+LSH_BANDS = 8
+MERSENNE_PRIME = (1 << 61) - 1
+
+def canonical_brands(brands):
+    # Maps each casefolded brand to its most common spelling ("OPPO" and "Oppo" -> "OPPO")
+    spelled = brands.dropna().astype(str).str.strip()
+    counts = spelled.groupby(spelled.str.casefold()).agg(lambda names: names.value_counts().index[0])
+    return brands.astype(str).str.strip().str.casefold().map(counts).where(brands.notna())
+
+def brand_group(brand):
+    brand = brand.casefold() if isinstance(brand, str) else ""
+    return BRAND_GROUPS.get(brand, brand)
+
+def normalize_model(model, group):
+    # "Xiaomi Redmi Note 12 Pro+ (8GB RAM + 128 GB)" -> "redmi note 12 pro plus 8 gb 128 gb"
+    text = str(model).casefold().replace(" + ", " ").replace("+", " plus ")
+    tokens = [token for token in re.findall(r"\d+|[a-z]+", text) if token not in NOISE_TOKENS]
+    # Drop the parent brand when the listing repeats it, but keep sub-brands like "redmi"
+    while tokens and tokens[0] == group:
+        tokens = tokens[1:]
+    return " ".join(tokens)
+
+def within_one_edit(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+def same_model(a, b):
+    # Same tokens in the same order, allowing one typo in words of four or more
+    # letters; numbers and short variant words ("pro", "s", "fe") must match exactly
+    a, b = a.split(), b.split()
+    return len(a) == len(b) and all(
+        x == y or (len(x) >= 4 and len(y) >= 4 and x.isalpha() and y.isalpha() and within_one_edit(x, y))
+        for x, y in zip(a, b)
+    )
+
+def shingles(text):
+    padded = f" {text} "
+    return {zlib.crc32(padded[i:i + SHINGLE_SIZE].encode()) for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+
+def minhash_signatures(shingle_sets, num_perm=NUM_PERMUTATIONS, seed=1):
+    rng = np.random.default_rng(seed)
+    # Shingle hashes and coefficients are below 2**32 and 2**31, so a * x + b fits in uint64
+    a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    for i, values in enumerate(shingle_sets):
+        x = np.fromiter(values, dtype=np.uint64, count=len(values))[:, None]
+        signatures[i] = ((a * x + b) % MERSENNE_PRIME).min(axis=0)
+    return signatures
+
+def model_skeleton(key):
+    # The parts same_model compares exactly: token count, numbers and short words
+    return " ".join(token if len(token) < 4 or not token.isalpha() else "*" for token in key.split())
+
+def lsh_candidates(signatures, blocks, bands=LSH_BANDS):
+    # Pairs of rows in the same block whose signatures agree on every value of at least one band
+    rows_per_band = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        chunk = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for i, key in enumerate(map(bytes, chunk)):
+            buckets.setdefault((blocks[i], key), []).append(i)
+        for members in buckets.values():
+            for j in range(1, len(members)):
+                for k in range(j):
+                    pairs.add((members[k], members[j]))
+    return pairs
+
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def union(parent, i, j):
+    i, j = find(parent, i), find(parent, j)
+    if i != j:
+        parent[max(i, j)] = min(i, j)
+
+def cluster_listings(groups, keys):
+    # Returns a cluster id per row; rows in one cluster are the same phone
+    keys = list(keys)
+    groups = list(groups)
+    n = len(keys)
+    parent = list(range(n))
+
+    # Exact matches on (brand group, model key)
+    first_seen = {}
+    for i, key in enumerate(zip(groups, keys)):
+        union(parent, i, first_seen.setdefault(key, i))
+
+    # Near matches among the distinct keys only
+    distinct = sorted(set(first_seen.values()))
+    shingle_sets = [shingles(keys[i]) for i in distinct]
+    # Keys are blocked on brand group and skeleton, so variants like "v1" ... "v80" never share a bucket
+    blocks = [(groups[i], model_skeleton(keys[i])) for i in distinct]
+    signatures = minhash_signatures(shingle_sets)
+    for x, y in lsh_candidates(signatures, blocks):
+        x, y = distinct[x], distinct[y]
+        if same_model(keys[x], keys[y]):
+            union(parent, x, y)
+
+    return np.array([find(parent, i) for i in range(n)])
+
+def dedupe_frame(df):
+    # Returns (merged, report). Each cluster keeps its first row, and missing or
+    # "Not specified" fields are filled from the other rows in the cluster.
+    df = df.reset_index(drop=True)
+    models = df["model"].astype(str).str.strip()
+    # Listings without a brand take the first word of the model name
+    brands = models.str.split().str[0]
+    if "brand" in df.columns:
+        brands = df["brand"].where(df["brand"].notna(), brands)
+    brands = canonical_brands(brands)
+    groups = [brand_group(brand) for brand in brands]
+    keys = [normalize_model(model, group) for model, group in zip(models, groups)]
+
+    clusters = cluster_listings(groups, keys)
+    df = df.assign(brand=brands, model=models)
+    missing = df.astype(str).apply(lambda column: column.str.strip().str.casefold()).isin(MISSING_VALUES) | df.isna()
+    merged = df.mask(missing).groupby(clusters, sort=False).first()
+    merged["duplicates"] = pd.Series(clusters).value_counts().reindex(merged.index).to_numpy() - 1
+    merged = merged.reset_index(drop=True)
+
+    report = {"rows": len(df), "phones": len(merged), "merged_rows": len(df) - len(merged)}
+    return merged, report
+
+def load_variants(paths):
+    # Reads every listing file that has a model column into one frame, tagged with its source
+    frames = []
+    for path in paths:
+        frame = normalize_frame(pd.read_csv(path))
+        if "model" not in frame.columns:
+            print(f"Skipping {path}: no model column", file=sys.stderr)
+            continue
+        frames.append(frame.assign(source=path))
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Merge duplicate phone listings across dataset files")
+    arg_parser.add_argument("paths", nargs="+")
+    arg_parser.add_argument("--output", default="merged_dataset.csv")
+    args = arg_parser.parse_args()
+
+    merged, report = dedupe_frame(load_variants(args.paths))
+    merged.to_csv(args.output, index=False)
+    print(f"{report['rows']:,} listings -> {report['phones']:,} phones ({report['merged_rows']:,} duplicates merged) -> {args.output}")
@@ -0,0 +1,69 @@
+import numpy as np
+
+from parser import parse_query, ParsedQuery
+from catalog import get_catalog, pack_bits
+from recommender import feature_weights, query_terms, candidate_rows
+
+# Facet counts
+# For the candidate set of any filter (brand, budget, intent, features, specs)
+# returns how many phones carry each tag, plus a price histogram. Small
+# candidate sets are counted by summing their rows of the tag matrix; large
+# ones by ANDing the filter bitmap with each tag's bitmap and counting bits,
+# so a sidebar refresh costs about as much as one query.
+PRICE_EDGES = [0, 10000, 15000, 20000, 30000, 40000, 60000, 80000, 100000]
+
+# Number of set bits in each byte value, for numpy versions without np.bitwise_count
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+def popcounts(words):
+    # Set bits per row of a 2-D uint64 array
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+def tag_counts(catalog, rows):
+    if len(rows) * 8 < len(catalog):
+        return catalog.tag_matrix[rows].sum(axis=0, dtype=np.int64)
+    mask = np.zeros(len(catalog), dtype=bool)
+    mask[rows] = True
+    return popcounts(catalog.tag_bitmaps & pack_bits(mask))
+
+def price_histogram(prices, edges=PRICE_EDGES):
+    # Buckets are [edge, next edge); the last one is open-ended
+    buckets = np.bincount(np.searchsorted(edges, prices, side="right") - 1, minlength=len(edges))
+    bounds = list(edges[1:]) + [None]
+    return [{"min": low, "max": high, "count": int(count)} for low, high, count in zip(edges, bounds, buckets)]
+
+def facet_counts(df, user_prompt=None, brand_filter=None, budget=None, intent=None, features=None, spec_filters=None, price_edges=PRICE_EDGES):
+    # The prompt (a string or a ParsedQuery), when given, supplies intent, budget,
+    # features and spec filters; explicit arguments override what was parsed from it
+    parsed_intent, parsed_budget, parsed_features, parsed_specs = None, None, set(), {}
+    if user_prompt:
+        query = user_prompt if isinstance(user_prompt, ParsedQuery) else parse_query(user_prompt)
+        parsed_intent, parsed_budget, parsed_features = query_terms(query)
+        parsed_specs = dict(query.spec_filters)
+    intent = intent if intent is not None else parsed_intent
+    budget = budget if budget is not None else parsed_budget
+    features = set(features) if features is not None else parsed_features
+    spec_filters = {**parsed_specs, **(spec_filters or {})}
+
+    catalog = get_catalog(df, feature_weights)
+    rows = candidate_rows(catalog, intent, budget, features, brand_filter, spec_filters)
+    counts = tag_counts(catalog, rows)
+    prices = catalog.prices[rows]
+    order = sorted((-int(count), tag) for tag, count in zip(catalog.tag_names, counts) if count)
+    return {
+        "total": len(rows),
+        "tags": {tag: -count for count, tag in order},
+        "price_histogram": price_histogram(prices, price_edges),
+        "price_range": {"min": int(prices.min()), "max": int(prices.max())} if len(rows) else None,
+    }
+
+if __name__ == "__main__":
+    from recommender import load_dataset
+    df = load_dataset()
+    for prompt in ["gaming phone under 30000", "5g phone with 120hz", "samsung camera phone"]:
+        facets = facet_counts(df, prompt)
+        top = ", ".join(f"{count} {tag}" for tag, count in list(facets["tags"].items())[:8])
+        print(f"\n{prompt}: {facets['total']} phones\n  {top}")
+        print("  " + ", ".join(f"{bucket['min']}+: {bucket['count']}" for bucket in facets["price_histogram"] if bucket["count"]))
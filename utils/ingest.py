@@ -0,0 +1,176 @@
+import argparse
+import codecs
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from tagger import tag_frame, BATCH_CHUNK_SIZE
+
+# Streaming ingestion
+# Reads a CSV, JSON-lines or JSON-array feed one chunk at a time, tags each
+# chunk with tag_frame and appends it to the tagged CSV. At most a few chunks
+# are held in memory, so the input can be far larger than RAM. Output goes to
+# a temporary file that replaces the target only when ingestion finishes.
+JSON_BLOCK_SIZE = 1 << 20
+
+class ByteCounter:
+    # Wraps a binary file and counts the bytes read through it
+    def __init__(self, f):
+        self.f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.f)
+
+def iter_json_records(f, block_size=JSON_BLOCK_SIZE):
+    # Yields objects from a JSON array or JSON-lines stream without loading it whole
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, eof = "", 0, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        record = None
+        if pos < len(buffer):
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Usually an object cut off at the end of the buffer
+                if eof:
+                    raise
+        elif eof:
+            return
+        if record is not None:
+            yield record
+            continue
+        block = f.read(block_size)
+        eof = not block
+        buffer, pos = buffer[pos:] + text.decode(block, final=eof), 0
+
+def iter_csv_chunks(f, chunk_size):
+    yield from pd.read_csv(f, chunksize=chunk_size)
+
+def iter_json_chunks(f, chunk_size):
+    records = []
+    for record in iter_json_records(f):
+        records.append(record)
+        if len(records) == chunk_size:
+            yield normalize_frame(pd.DataFrame.from_records(records))
+            records = []
+    if records:
+        yield normalize_frame(pd.DataFrame.from_records(records))
+
+def normalize_frame(df):
+    # Summary-style records (datasets/phones_data_formatted.json) pack several
+    # specs into one field; split them into the columns tag_frame reads
+    if "rear camera" in df.columns or not {"display", "camera"} <= set(df.columns):
+        return df
+    text = {column: df[column].astype("string") if column in df.columns else pd.Series(pd.NA, index=df.index, dtype="string")
+            for column in ["model", "processor", "ram", "display", "camera", "battery", "sim", "os", "card"]}
+    sim = text["sim"].str.lower()
+    yes_no = lambda mask: mask.fillna(False).map({True: "Yes", False: "No"})
+    out = pd.DataFrame({
+        "brand": text["model"].str.split().str[0],
+        "model": text["model"],
+        "price": df.get("price"),
+        "rating": df.get("rating"),
+        "processor": text["processor"].str.extract(r"^([^,]+)", expand=False).str.strip(),
+        "cpu cores": text["processor"].str.extract(r"(\w+ Core)", expand=False),
+        "processor speed": text["processor"].str.extract(r"([\d.]+ GHz Processor)", expand=False),
+        "ram": text["ram"].str.extract(r"([\d.]+ (?:GB|MB) RAM)", expand=False),
+        "storage": text["ram"].str.extract(r"([\d.]+ (?:GB|TB) inbuilt)", expand=False),
+        "memory card support": yes_no(~text["card"].str.contains("Not Supported").fillna(False)),
+        "os": text["os"],
+        "display size": text["display"].str.extract(r"([\d.]+ inches)", expand=False),
+        "display resolution": text["display"].str.replace(r"^[\d.]+ inches,\s*", "", regex=True),
+        "refresh rate": text["display"].str.extract(r"(\d+ Hz)", expand=False),
+        "rear camera": text["camera"].str.extract(r"^([^&]*)", expand=False).str.strip(),
+        "front camera": text["camera"].str.extract(r"&\s*(.*)$", expand=False),
+        "battery": text["battery"].str.extract(r"(\d+ mAh)", expand=False),
+        "charging speed": text["battery"].str.extract(r"with (.*)$", expand=False),
+        "fast charging available or not": yes_no(text["battery"].str.contains("Fast Charging")),
+        "sim slots": text["sim"].str.extract(r"^(Dual Sim|Single Sim)", expand=False),
+        "5G": yes_no(sim.str.contains("5g")),
+        "4G volte": yes_no(sim.str.contains("volte")),
+        "4G": yes_no(sim.str.contains("4g")),
+        "3G": yes_no(sim.str.contains("3g")),
+        "nfc": yes_no(sim.str.contains("nfc")),
+    })
+    return out.astype(object).where(out.notna(), None)
+
+def read_chunks(f, path, chunk_size):
+    if path.lower().endswith((".json", ".jsonl", ".ndjson")):
+        return iter_json_chunks(f, chunk_size)
+    return iter_csv_chunks(f, chunk_size)
+
+def tagged_chunks(chunks, workers):
+    # Yields (chunk, tags) in input order; with a pool, only 2 * workers chunks are in flight
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, tag_frame(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append((chunk, pool.submit(tag_frame, chunk)))
+            if len(in_flight) >= 2 * workers:
+                chunk, future = in_flight.popleft()
+                yield chunk, future.result()
+        while in_flight:
+            chunk, future = in_flight.popleft()
+            yield chunk, future.result()
+
+def print_progress(stats):
+    percent = f" ({stats['bytes'] / stats['total_bytes']:.0%})" if stats["total_bytes"] else ""
+    print(f"{stats['rows']:,} rows, {stats['bytes'] / 1e6:,.1f} MB read{percent}, {stats['rows_per_sec']:,.0f} rows/sec", file=sys.stderr)
+
+def ingest(source_path, output_path, chunk_size=BATCH_CHUNK_SIZE, workers=1, progress=print_progress):
+    # Returns the final stats dict: rows, chunks, bytes, total_bytes, seconds, rows_per_sec
+    start = time.perf_counter()
+    stats = {"rows": 0, "chunks": 0, "bytes": 0, "total_bytes": os.path.getsize(source_path), "seconds": 0.0, "rows_per_sec": 0.0}
+    columns = None
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(source_path, "rb") as raw, open(tmp_path, "w", encoding="utf-8", newline="") as out:
+            f = ByteCounter(raw)
+            for chunk, tags in tagged_chunks(read_chunks(f, source_path, chunk_size), workers):
+                # The first chunk fixes the output columns; later chunks are aligned to them
+                if columns is None:
+                    columns = [column for column in chunk.columns if column != "tags"]
+                chunk = chunk.reindex(columns=columns)
+                chunk["tags"] = tags
+                chunk.to_csv(out, header=stats["chunks"] == 0, index=False)
+
+                stats["rows"] += len(chunk)
+                stats["chunks"] += 1
+                stats["bytes"] = f.bytes_read
+                stats["seconds"] = time.perf_counter() - start
+                stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+                if progress:
+                    progress(stats)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return stats
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Tag a CSV, JSON or JSON-lines phone feed in chunks")
+    arg_parser.add_argument("source", nargs="?", default="final dataset.csv")
+    arg_parser.add_argument("output", nargs="?", default="tagged_dataset.csv")
+    arg_parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    arg_parser.add_argument("--workers", type=int, default=1)
+    args = arg_parser.parse_args()
+
+    stats = ingest(args.source, args.output, chunk_size=args.chunk_size, workers=args.workers)
+    print(f"Tagged {stats['rows']:,} rows in {stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/sec) -> {args.output}")
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from parser import SAMPLE_PROMPTS, INTENT_KEYWORDS, SUPPORTING_FEATURES, known_brands, parse_query
+from benchmark import UTILS_DIR, TAGGED_PATH, scaled_catalog, find_regressions, print_results
+
+# Load test
+# Replays a realistic prompt mix against recommend_phone in this process, or
+# against a running HTTP service (app.py), at a fixed concurrency. Prompts come
+# from SAMPLE_PROMPTS plus templates filled with intent/feature phrases, budgets
+# and brands; a few prompts are far more popular than the rest (Zipf-like), as
+# in real traffic, so the cache hit rate is meaningful.
+BASELINE_PATH = os.path.join(UTILS_DIR, "loadtest_baseline.json")
+BUDGETS = [8000, 10000, 12000, 15000, 20000, 25000, 30000, 40000, 50000, 70000, 100000]
+TEMPLATES = [
+    "{intent} phone",
+    "I want a {intent} phone under {budget}",
+    "phone with {phrase} and {feature}",
+    "{brand} phone with good {phrase}",
+    "best {brand} {intent} phone under {budget}",
+    "need {feature} and {feature2} below {budget}",
+    "{phrase} {feature} {brand}",
+]
+
+def prompt_pool(size, seed=0):
+    # SAMPLE_PROMPTS followed by generated prompts, all distinct
+    rng = random.Random(seed)
+    features = [phrase for phrases in SUPPORTING_FEATURES.values() for phrase in phrases]
+    pool = list(dict.fromkeys(SAMPLE_PROMPTS))
+    seen = set(pool)
+    attempts = 0
+    while len(pool) < size and attempts < size * 20:
+        attempts += 1
+        intent = rng.choice(list(INTENT_KEYWORDS))
+        prompt = rng.choice(TEMPLATES).format(
+            intent=intent,
+            phrase=rng.choice(INTENT_KEYWORDS[intent]),
+            feature=rng.choice(features),
+            feature2=rng.choice(features),
+            budget=rng.choice(BUDGETS),
+            brand=rng.choice(known_brands),
+        )
+        if prompt not in seen:
+            seen.add(prompt)
+            pool.append(prompt)
+    return pool
+
+def traffic(pool, count, skew=1.1, seed=0):
+    # The i-th prompt of a shuffled pool is drawn with weight 1 / (i + 1) ** skew
+    rng = random.Random(seed)
+    order = list(pool)
+    rng.shuffle(order)
+    weights = [1 / (rank + 1) ** skew for rank in range(len(order))]
+    return rng.choices(order, weights=weights, k=count)
+
+def rss_mb(pid="self"):
+    # Resident set size from /proc (Linux only), None where it cannot be read
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+class RssSampler:
+    # Samples a process's RSS in the background and keeps the peak
+    def __init__(self, pid="self", interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.start = rss_mb(pid)
+        self.peak = self.start
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = rss_mb(self.pid)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.end = rss_mb(self.pid)
+
+def summarize(mode, samples, wall, concurrency, hits, misses, rss=None, statuses=None):
+    samples = np.array(samples) * 1000
+    results = {
+        f"{mode} requests": len(samples),
+        f"{mode} concurrency": concurrency,
+        f"{mode} throughput (req/sec)": len(samples) / wall if wall else 0.0,
+        f"{mode} p50 (ms)": np.percentile(samples, 50),
+        f"{mode} p95 (ms)": np.percentile(samples, 95),
+        f"{mode} p99 (ms)": np.percentile(samples, 99),
+        f"{mode} cache hit rate (%)": 100 * hits / (hits + misses) if hits + misses else 0.0,
+    }
+    if rss is not None and rss.start is not None and rss.end is not None:
+        results[f"{mode} RSS start (MB)"] = rss.start
+        results[f"{mode} RSS peak (MB)"] = rss.peak
+        results[f"{mode} RSS growth (MB)"] = rss.end - rss.start
+    if statuses:
+        for status, count in sorted(statuses.items()):
+            results[f"{mode} status {status}"] = count
+    return results
+
+def run_local(prompts, concurrency=4, scale=1, top_n=5):
+    # Calls recommend_phone from a thread pool with the prompt parsed once, as app.py does
+    from recommender import load_dataset, get_catalog, recommend_phone, feature_weights, query_cache
+    catalog = get_catalog(scaled_catalog(load_dataset(TAGGED_PATH), scale), feature_weights)
+    query_cache.clear()
+    samples = [0.0] * len(prompts)
+
+    def call(i):
+        start = time.perf_counter()
+        query = parse_query(prompts[i])
+        recommend_phone(query, catalog, top_n=top_n, brand_filter=query.brand)
+        samples[i] = time.perf_counter() - start
+
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(call, range(len(prompts))))
+        wall = time.perf_counter() - start
+    stats = query_cache.stats()
+    return summarize("local", samples, wall, concurrency, stats["hits"], stats["misses"], rss)
+
+async def run_http(url, prompts, concurrency=4, top_n=5, pid=None):
+    # POSTs to url/recommend from `concurrency` clients; the cache hit rate comes from /stats
+    import aiohttp
+    url = url.rstrip("/")
+    samples = []
+    statuses = Counter()
+    queue = iter(prompts)
+
+    async def client(session):
+        for prompt in queue:
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{url}/recommend", json={"prompt": prompt, "top_n": top_n}) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+            except aiohttp.ClientError:
+                statuses["error"] += 1
+            samples.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async with session.get(f"{url}/stats") as response:
+            before = (await response.json())["cache"]
+        with RssSampler(pid) if pid else contextlib.nullcontext() as rss:
+            start = time.perf_counter()
+            await asyncio.gather(*(client(session) for _ in range(concurrency)))
+            wall = time.perf_counter() - start
+        async with session.get(f"{url}/stats") as response:
+            after = (await response.json())["cache"]
+    hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+    return summarize("http", samples, wall, concurrency, hits, misses, rss, statuses)
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Replay a realistic prompt mix against the recommender")
+    arg_parser.add_argument("--requests", type=int, default=2000)
+    arg_parser.add_argument("--concurrency", type=int, default=4)
+    arg_parser.add_argument("--pool", type=int, default=500, help="number of distinct prompts")
+    arg_parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of prompt popularity")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--scale", type=int, default=1, help="catalog copies for local runs")
+    arg_parser.add_argument("--url", help="base URL of a running app.py; local recommend_phone when omitted")
+    arg_parser.add_argument("--pid", help="server process id, to report its RSS during an HTTP run")
+    arg_parser.add_argument("--save-baseline", action="store_true")
+    arg_parser.add_argument("--check", action="store_true", help="exit 1 when worse than the baseline")
+    arg_parser.add_argument("--tolerance", type=float, default=0.2)
+    args = arg_parser.parse_args()
+
+    prompts = traffic(prompt_pool(args.pool, args.seed), args.requests, args.skew, args.seed)
+    if args.url:
+        results = asyncio.run(run_http(args.url, prompts, args.concurrency, pid=args.pid))
+    else:
+        results = run_local(prompts, args.concurrency, args.scale)
+
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({**(baseline or {}), **results}, f, indent=2)
+        print(f"Saved baseline to {BASELINE_PATH}")
+    elif args.check:
+        if baseline is None:
+            sys.exit(f"No baseline at {BASELINE_PATH}, run with --save-baseline first")
+        # RSS start and growth are too small and noisy for a relative tolerance; the peak is checked
+        checked = {name: value for name, value in results.items() if name.endswith(("(ms)", "(req/sec)", "RSS peak (MB)"))}
+        regressions = find_regressions(checked, baseline, args.tolerance)
+        for name, base, value in regressions:
+            print(f"REGRESSION {name}: {base:,.2f} -> {value:,.2f}")
+        sys.exit(1 if regressions else 0)
@@ -1,4 +1,6 @@
 import re
+from collections import namedtuple
+from functools import lru_cache
 
 INTENT_KEYWORDS = {
     "gaming": [
@@ -52,23 +54,131 @@ SUPPORTING_FEATURES = {
     ]
 }
 
-def parse_prompt(prompt):
-    prompt = prompt.lower()
-    result = {"intent": None, "budget": None, "keywords": [], "supporting_features": []}
+# Keyword matcher (built once at import)
+# Every keyword is a run of \w+ tokens joined by single separators, so a
+# phrase matches exactly when the prompt text spanning those tokens equals
+# it. Scanning token windows up to the longest phrase finds all intent and
+# supporting-feature keywords in one pass, including overlapping ones.
+TOKEN_PATTERN = re.compile(r"\w+")
+K_BUDGET_PATTERN = re.compile(r"(?:under|below|less than|upto|within)?\s*(\d{1,2})\s*k\b")
+BUDGET_PATTERN = re.compile(r"(?:under|below|less than|upto|within|under rs\.?|\u20b9|inr)?\s*[₹\u20b9rs\.]?\s*([0-9]{1,3}(?:,?[0-9]{2,3})+|[0-9]{4,6})(?!g)\b")
+
+# Numeric spec constraints ("8gb ram", "5000 mah", "120hz", "at least 50mp",
+# "under 6.5 inch"). Each becomes a (low, high) range on a typed catalog spec
+# column (see specs.py); a bare value means "at least", while words like
+# "under" or "max" before it make it an upper bound. Matched spans are blanked
+# before budget detection so "5000 mah" is not read as a price.
+UPPER_BOUND_WORDS = r"(?:under|below|less than|upto|up to|max|maximum|at most|smaller than|within)"
+LOWER_BOUND_WORDS = r"(?:over|above|more than|at least|min|minimum|bigger than|larger than|atleast)"
+# A number must not continue a longer one ("128gb" is not 28, "16.5" is not 6.5),
+# and a bare "in" is a unit only before a screen word ("6.5 in display")
+NUMBER_START = r"(?<![\d.])"
+INCH_UNIT = r"(?:inch(?:es)?|in\b(?=\s*(?:display|screen))|\")"
+SPEC_CONSTRAINT_PATTERNS = [
+    ("ram_gb", re.compile(NUMBER_START + r"(\d{1,2}(?:\.\d+)?)\s*gb\s*(?:of\s*)?ram\b")),
+    ("storage_gb", re.compile(NUMBER_START + r"(\d{1,4})\s*(gb|tb)\s*(?:of\s*)?(?:storage|rom|internal|inbuilt|memory)\b")),
+    ("battery_mah", re.compile(NUMBER_START + r"(\d{4,5})\s*mah\b")),
+    ("refresh_hz", re.compile(NUMBER_START + r"(\d{2,3})\s*hz\b")),
+    ("front_mp", re.compile(NUMBER_START + r"(\d{1,3}(?:\.\d+)?)\s*mp\s*(?:front|selfie)")),
+    ("rear_mp", re.compile(NUMBER_START + r"(\d{1,3}(?:\.\d+)?)\s*mp\b")),
+    ("display_in", re.compile(NUMBER_START + r"(\d(?:\.\d+)?)\s*" + INCH_UNIT)),
+    # Bare sizes: small ones are RAM ("8gb"), large ones storage ("256gb")
+    ("size_gb", re.compile(NUMBER_START + r"(\d{1,4})\s*(gb|tb)\b")),
+]
+DISPLAY_RANGE_PATTERN = re.compile(r"between\s*" + NUMBER_START + r"(\d(?:\.\d+)?)\s*(?:and|-|to)\s*" + NUMBER_START + r"(\d(?:\.\d+)?)\s*" + INCH_UNIT)
+UPPER_BOUND_PATTERN = re.compile(UPPER_BOUND_WORDS + r"\s*$")
+LOWER_BOUND_PATTERN = re.compile(LOWER_BOUND_WORDS + r"\s*$")
+# A bare screen size matches phones within this many inches of it
+DISPLAY_TOLERANCE = 0.2
+
+def extract_spec_filters(prompt):
+    # Returns ({spec: (low, high)}, prompt with the matched spans blanked out)
+    filters = {}
+    spans = []
+
+    def bound(match):
+        before = prompt[max(0, match.start() - 16):match.start()]
+        if UPPER_BOUND_PATTERN.search(before):
+            return "high"
+        if LOWER_BOUND_PATTERN.search(before):
+            return "low"
+        return None
+
+    def taken(match):
+        return any(start < match.end() and match.start() < end for start, end in spans)
+
+    for match in DISPLAY_RANGE_PATTERN.finditer(prompt):
+        low, high = sorted([float(match.group(1)), float(match.group(2))])
+        filters["display_in"] = (low, high)
+        spans.append(match.span())
+
+    for name, pattern in SPEC_CONSTRAINT_PATTERNS:
+        for match in pattern.finditer(prompt):
+            if taken(match):
+                continue
+            value = float(match.group(1))
+            if name in ("storage_gb", "size_gb") and match.group(2) == "tb":
+                value *= 1024
+            if name == "size_gb":
+                name_for_value = "ram_gb" if value <= 24 else "storage_gb"
+            else:
+                name_for_value = name
+            if name_for_value in filters:
+                continue
+            side = bound(match)
+            if side == "high":
+                filters[name_for_value] = (None, value)
+            elif side == "low" or name_for_value != "display_in":
+                filters[name_for_value] = (value, None)
+            else:
+                filters[name_for_value] = (round(value - DISPLAY_TOLERANCE, 2), round(value + DISPLAY_TOLERANCE, 2))
+            spans.append(match.span())
+
+    for start, end in spans:
+        prompt = prompt[:start] + " " * (end - start) + prompt[end:]
+    return filters, prompt
+
+def build_keyword_table():
+    table = {}
+    for group, source in (("supporting", SUPPORTING_FEATURES), ("intent", INTENT_KEYWORDS)):
+        for name, keywords in source.items():
+            for kw in keywords:
+                entry = table.setdefault(kw, {"supporting": [], "intent": []})
+                entry[group].append(name)
+    return table
+
+KEYWORD_TABLE = build_keyword_table()
+MAX_PHRASE_TOKENS = max(len(TOKEN_PATTERN.findall(kw)) for kw in KEYWORD_TABLE)
+
+def match_keywords(prompt):
+    # Returns {keyword: occurrences} for every keyword found in a lowercased prompt
+    spans = [(m.start(), m.end()) for m in TOKEN_PATTERN.finditer(prompt)]
+    found = {}
+    for i, (start, _) in enumerate(spans):
+        for j in range(i, min(i + MAX_PHRASE_TOKENS, len(spans))):
+            phrase = prompt[start:spans[j][1]]
+            if phrase in KEYWORD_TABLE:
+                found[phrase] = found.get(phrase, 0) + 1
+    return found
+
+def scan_prompt(prompt):
+    # One pass over a lowercased prompt: (spec_filters, budget, keywords, supporting features, intent)
+    spec_filters, budget_text = extract_spec_filters(prompt)
 
     # Budget detection
-    k_budget_match = re.search(r"(?:under|below|less than|upto|within)?\s*(\d{1,2})\s*k\b", prompt)
+    budget = None
+    k_budget_match = K_BUDGET_PATTERN.search(budget_text)
     if k_budget_match:
         try:
-            result["budget"] = int(k_budget_match.group(1)) * 1000
+            budget = int(k_budget_match.group(1)) * 1000
         except ValueError:
             pass
     else:
-        budget_match = re.search(r"(?:under|below|less than|upto|within|under rs\.?|\u20b9|inr)?\s*[₹\u20b9rs\.]?\s*([0-9]{1,3}(?:,?[0-9]{2,3})+|[0-9]{4,6})(?!g)\b", prompt)
+        budget_match = BUDGET_PATTERN.search(budget_text)
         if budget_match:
             num_str = budget_match.group(1).replace(",", "")
             try:
-                result["budget"] = int(num_str)
+                budget = int(num_str)
             except ValueError:
                 pass
 
@@ -76,45 +186,46 @@ def parse_prompt(prompt):
     matched_supporting = set()
     intent_scores = {intent: 0 for intent in INTENT_KEYWORDS}
 
-    full_phrases = prompt
-
-    # Check for multi-word keywords first
-    for feature, keywords in SUPPORTING_FEATURES.items():
-        for kw in keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", full_phrases):
-                matched_keywords.add(kw)
-                matched_supporting.add(feature)
-
-    for intent, keywords in INTENT_KEYWORDS.items():
-        for kw in keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", full_phrases):
-                matched_keywords.add(kw)
-                intent_scores[intent] += 1
-
-    # Fallback to individual words
-    words = re.findall(r"\w+", full_phrases)
-    for word in words:
-        for feature, keywords in SUPPORTING_FEATURES.items():
-            if word in keywords:
-                matched_keywords.add(word)
-                matched_supporting.add(feature)
-        for intent, keywords in INTENT_KEYWORDS.items():
-            if word in keywords:
-                matched_keywords.add(word)
-                intent_scores[intent] += 1
-
-    result["keywords"] = list(matched_keywords)
-    result["supporting_features"] = list(matched_supporting)
+    for kw, count in match_keywords(prompt).items():
+        entry = KEYWORD_TABLE[kw]
+        matched_keywords.add(kw)
+        matched_supporting.update(entry["supporting"])
+        # A phrase scores once per list it appears in; single words also
+        # score once per occurrence in the prompt
+        bonus = 1 + count if TOKEN_PATTERN.fullmatch(kw) else 1
+        for intent in entry["intent"]:
+            intent_scores[intent] += bonus
 
     top_score = max(intent_scores.values())
     top_intents = [intent for intent, score in intent_scores.items() if score == top_score and score > 0]
-    if top_intents:
-        result["intent"] = top_intents[0]
+    intent = top_intents[0] if top_intents else None
+
+    return spec_filters, budget, matched_keywords, matched_supporting, intent
+
+def parse_prompt(prompt):
+    spec_filters, budget, keywords, supporting, intent = scan_prompt(prompt.lower())
+    return {"intent": intent, "budget": budget, "keywords": list(keywords), "supporting_features": list(supporting), "spec_filters": spec_filters}
+
+# Parsed query
+# Everything recommend_phone needs from a prompt, found in one pass. It is
+# immutable and hashable, so parse_query results are memoized per prompt and
+# the object can be handed from the HTTP handler to recommend_phone without
+# parsing again. features are the supporting features, or the matched
+# keywords when there are none; spec_filters is a sorted tuple of
+# (spec, (low, high)) pairs.
+known_brands = ["Apple", "Samsung", "Xiaomi", "OnePlus", "Realme", "Vivo", "Oppo", "Asus", "Motorola", "Google"]
+
+ParsedQuery = namedtuple("ParsedQuery", ["text", "intent", "budget", "features", "brand", "spec_filters"])
 
-    return result
+@lru_cache(maxsize=4096)
+def parse_query(prompt):
+    lowered = prompt.lower()
+    spec_filters, budget, keywords, supporting, intent = scan_prompt(lowered)
+    brand = next((brand for brand in known_brands if brand.lower() in lowered), None)
+    return ParsedQuery(prompt, intent, budget, frozenset(supporting or keywords), brand, tuple(sorted(spec_filters.items())))
 
-'''Sample prompts
-samples = [
+# Sample prompts
+SAMPLE_PROMPTS = [
     "I want a gaming phone under 25000",
     "Best phone for photography under ₹30,000",
     "Need a phone with great battery and fast charging",
@@ -138,10 +249,13 @@ samples = [
     "Something with a crisp display and a strong battery",
     "Decent phone with 5G, good camera, and expandable storage",
     "A reliable camera phone for travel with good RAM and 256GB storage",
-    "Entry-level Android with decent performance and big screen"
+    "Entry-level Android with decent performance and big screen",
+    "Gaming phone with 8GB RAM, 5000mAh battery and 120Hz display under 30k",
+    "Camera phone with at least 50MP and a 32MP selfie camera",
+    "Compact phone under 6.2 inches with 128GB storage"
 ]
 
-for s in samples:
-    print(f"\nPrompt: {s}")
-    print(parse_prompt(s))
-'''
\ No newline at end of file
+if __name__ == "__main__":
+    for s in SAMPLE_PROMPTS:
+        print(f"\nPrompt: {s}")
+        print(parse_prompt(s))
@@ -1,8 +1,11 @@
 import pandas as pd
+import numpy as np
 import ast
-import re
-from parser import parse_prompt
-import os
+import io
+from parser import parse_query, ParsedQuery
+from cache import QueryCache
+from tracing import Trace
+from catalog import get_catalog, register_catalog, intersect_rows, bundle_path, bundle_is_fresh, write_bundle, load_bundle
 
 # Fix the price column
 def clean_price(value):
@@ -11,18 +14,66 @@ def clean_price(value):
     except:
         return None
 
-# Load dataset function
-def load_dataset(path='tagged_dataset.csv'):
+# Rows an incremental tagger run appended after a repeat of the header line.
+# Each replaces the earlier row of the same model in place; new models go last.
+def read_appended_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        lines = f.readlines()
+    segments = [[lines[0]]]
+    for line in lines[1:]:
+        if line.rstrip("\r\n") == lines[0].rstrip("\r\n"):
+            segments.append([lines[0]])
+        else:
+            segments[-1].append(line)
+    combined = pd.concat([pd.read_csv(io.StringIO("".join(segment))) for segment in segments], ignore_index=True)
+    latest = combined.drop_duplicates("model", keep="last").set_index("model")
+    return latest.loc[combined["model"].drop_duplicates()].reset_index()[combined.columns]
+
+# Read and clean the tagged CSV
+def read_tagged_csv(path='tagged_dataset.csv'):
     df = pd.read_csv(path)
+    if (df["model"] == "model").any():
+        df = read_appended_csv(path)
     df['tags'] = df['tags'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else [])
     df["price"] = df["price"].apply(clean_price)
     df.dropna(subset=["price"], inplace=True)
     df["price"] = df["price"].astype(int)
     return df
 
-# Brand and feature weights
-known_brands = ["Apple", "Samsung", "Xiaomi", "OnePlus", "Realme", "Vivo", "Oppo", "Asus", "Motorola", "Google"]
+# Load dataset function
+# Uses the compiled bundle when it is up to date with the CSV, otherwise parses the CSV.
+# From a bundle, get_catalog(df) returns the memory-mapped catalog the frame was read from.
+def load_dataset(path='tagged_dataset.csv'):
+    catalog = load_bundle_catalog(path)
+    if catalog is None:
+        return read_tagged_csv(path)
+    # A shallow copy, so the cache entry keyed on the frame does not keep it alive
+    df = catalog.df.copy(deep=False)
+    register_catalog(df, catalog)
+    return df
+
+# The catalog for a tagged CSV, memory-mapped from its bundle when that is up to date
+def load_catalog(path='tagged_dataset.csv'):
+    catalog = load_bundle_catalog(path)
+    if catalog is None:
+        catalog = get_catalog(read_tagged_csv(path), feature_weights)
+    return catalog
+
+def load_bundle_catalog(path):
+    bundle = bundle_path(path)
+    if bundle_is_fresh(bundle, path):
+        return load_bundle(bundle, feature_weights)
+    return None
+
+# Compile the tagged CSV into a bundle, skipped when the CSV is unchanged
+def build_catalog(path='tagged_dataset.csv', force=False):
+    bundle = bundle_path(path)
+    if force or not bundle_is_fresh(bundle, path):
+        df = read_tagged_csv(path)
+        write_bundle(get_catalog(df, feature_weights), bundle, path)
+    return bundle
 
+# Feature weights
 feature_weights = {
     "performance": 2.0,
     "camera": 1.8,
@@ -40,79 +91,332 @@ feature_weights = {
     "content creation": 1.3
 }
 
-# Extract budget intelligently
+# Budget and brand as parse_query finds them, so they always agree with the query that is run
 def extract_budget_from_prompt(prompt):
-    prompt = prompt.lower()
-    if any(word in prompt for word in ["affordable", "budget", "cheap", "low-end"]):
-        return 20000  # Default budget for affordability
-    numbers = re.findall(r'\d+', prompt.replace(',', ''))
-    for num in numbers:
-        value = int(num)
-        if value >= 1000:
-            return value
-    return None
+    return parse_query(prompt).budget
 
 def extract_brand_from_prompt(prompt):
-    prompt_lower = prompt.lower()
-    for brand in known_brands:
-        if brand.lower() in prompt_lower:
-            return brand
-    return None
-
-def recommend_phone(user_prompt, df, top_n=5, debug=False, brand_filter=None):
-    parsed = parse_prompt(user_prompt)
-    intent = parsed.get("intent")
-    budget = parsed.get("budget")
+    return parse_query(prompt).brand
+
+# Ranking: partial selection of the best offset + top_n rows instead of a full sort.
+# Ties are broken deterministically by lower price, then model name, then row order.
+# Rows scoring above the k-th best score are all kept; the rest of the k come from
+# the rows tied at that score, picked by argpartition on a (price, model) key, so
+# only k rows are ever sorted however large the tie group is.
+def select_top(catalog, rows, scores, top_n, offset=0):
+    k = offset + top_n
+    if k <= 0 or len(rows) == 0:
+        return rows[:0], scores[:0]
+    if k < len(rows):
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)
+        keep = np.concatenate([above, first_ties(catalog, rows[tied], k - len(above), tied)])
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((catalog.model_ranks[rows], catalog.prices[rows], -scores))[offset:k]
+    return rows[order], scores[order]
+
+def first_ties(catalog, tied_rows, count, positions):
+    # positions of the count tied rows that come first by price, model, then row order
+    if count >= len(tied_rows):
+        return positions
+    keys = catalog.prices[tied_rows].astype(np.int64) * len(catalog) + catalog.model_ranks[tied_rows]
+    cutoff = np.partition(keys, count - 1)[count - 1]
+    below = np.flatnonzero(keys < cutoff)
+    # Rows sharing the cutoff key are taken in row order, as the stable lexsort would
+    at_cutoff = np.flatnonzero(keys == cutoff)[:count - len(below)]
+    return positions[np.concatenate([below, at_cutoff])]
+
+# Results are cached per normalized query, so prompts that parse the same share an entry
+query_cache = QueryCache(maxsize=1024, ttl=300)
+
+def query_terms(parsed):
+    if isinstance(parsed, ParsedQuery):
+        return parsed.intent, parsed.budget, parsed.features
     features = set(parsed.get("supporting_features", []))
-
     if not features:
         features = set(parsed.get("keywords", []))
+    return parsed.get("intent"), parsed.get("budget"), features
 
-    if debug:
-        print(f"\nParsed Query:\n- Intent: {intent}\n- Budget: {budget}\n- Features: {features}\n- Brand Filter: {brand_filter}\n")
-
-    filtered_df = df.copy()
-
-    if brand_filter:
-        filtered_df = filtered_df[filtered_df['brand'].str.lower() == brand_filter.lower()]
-
-    if budget:
-        filtered_df = filtered_df[filtered_df['price'] <= budget]
+def spec_filter_key(spec_filters):
+    # Hashable form of spec filters: numeric bounds as tuples, category names lowercased and sorted
+    if not spec_filters:
+        return None
+    return tuple(sorted(
+        (name, tuple(sorted(value.lower() for value in condition)) if isinstance(condition, (list, set, frozenset)) else tuple(condition))
+        for name, condition in spec_filters.items()
+    ))
+
+def query_key(catalog, intent, budget, features, brand_filter, top_n, offset, spec_filters=None, semantic_key=None):
+    # Features that are not catalog tags only affect the score through their weight,
+    # so queries that differ only in such wording share a key
+    matchable = tuple(sorted(f for f in features if f in catalog.tag_ids))
+    unmatched_weights = tuple(sorted(feature_weights.get(f, 1.0) for f in features if f not in catalog.tag_ids))
+    brand = brand_filter.lower() if brand_filter else None
+    return (intent, budget, matchable, unmatched_weights, "affordable" in features, brand, top_n, offset, spec_filter_key(spec_filters), semantic_key)
+
+# Semantic blending, used when the catalog has a semantic index attached (semantic.attach_semantic).
+# The final score is (1 - weight) * keyword score + weight * 500 * cosine similarity,
+# over the keyword candidates plus the nearest neighbours of the prompt.
+SEMANTIC_WEIGHT = 0.3
+SEMANTIC_CANDIDATES = 100
+
+def semantic_query(catalog, prompt, weight=None):
+    # Returns ((index, vector, weight), key), or (None, None) when there is no index or no known word
+    weight = SEMANTIC_WEIGHT if weight is None else weight
+    if catalog.semantic is None or weight <= 0:
+        return None, None
+    vector, key = catalog.semantic.query(prompt)
+    if vector is None:
+        return None, None
+    return (catalog.semantic, vector, weight), key + (weight,)
+
+def recommend_phone(user_prompt, df, top_n=5, debug=False, brand_filter=None, offset=0, use_cache=True, trace=None, spec_filters=None, semantic_weight=None):
+    # user_prompt: a prompt string or a ParsedQuery from parser.parse_query; the brand
+    # it mentions is only applied when passed as brand_filter
+    # trace: optional tracing.Trace, filled with the time spent in each stage
+    # semantic_weight: share of the score taken from semantic similarity, SEMANTIC_WEIGHT by default; 0 turns it off
+    # spec_filters: {"ram_gb": (8, None), "refresh_hz": (120, None), "processor": ["snapdragon"]}, see specs.spec_mask;
+    # they are added to the constraints parsed from the prompt and win where both set the same spec
+    query = user_prompt if isinstance(user_prompt, ParsedQuery) else parse_query(user_prompt)
+    intent, budget, features = query_terms(query)
+    spec_filters = {**dict(query.spec_filters), **(spec_filters or {})}
+    if trace:
+        trace.mark("parse")
 
+    if debug:
+        print(f"\nParsed Query:\n- Intent: {intent}\n- Budget: {budget}\n- Features: {features}\n- Brand Filter: {brand_filter}\n- Spec Filters: {spec_filters}\n")
+
+    catalog = get_catalog(df, feature_weights)
+    semantic, semantic_key = semantic_query(catalog, query.text, semantic_weight)
+    if trace and semantic:
+        trace.mark("embed")
+    if not use_cache:
+        result = run_query(catalog, intent, budget, features, brand_filter, top_n, offset, spec_filters, trace, semantic)
+    else:
+        key = query_key(catalog, intent, budget, features, brand_filter, top_n, offset, spec_filters, semantic_key)
+        result = query_cache.get(catalog.version, key)
+        if trace:
+            trace.mark("cache")
+        if result is None:
+            result = run_query(catalog, intent, budget, features, brand_filter, top_n, offset, spec_filters, trace, semantic)
+            # Semantic results depend on the index of this catalog, so they are not recomputed on reload
+            recompute = None if semantic else (intent, budget, features, brand_filter, top_n, offset, spec_filters)
+            query_cache.put(catalog.version, key, result, recompute)
+        result = result if isinstance(result, str) else result.copy()
+        if trace:
+            trace.mark("materialize")
+
+    if debug and trace:
+        print(trace)
+    return result
+
+def candidate_terms(catalog, intent, features):
+    # Terms whose phones are the candidates, or None when every phone passing the
+    # filters is one: no features or intent, or features none of which (nor the
+    # intent) is a tag, in which case they all score 0 as in the original loop
     if intent and not features:
-        filtered_df = filtered_df[filtered_df['tags'].apply(lambda tags: intent in tags)]
-
-    def compute_score(row):
-        tags = row['tags']
-        price = row['price']
-        matched = features.intersection(set(tags))
-        matched_score = sum(feature_weights.get(f, 1.0) for f in matched)
-        intent_bonus = feature_weights.get(intent, 1.0) if intent in tags else 0
-        total_possible = sum(feature_weights.get(f, 1.0) for f in features) + (feature_weights.get(intent, 1.0) if intent else 0)
-        final_score = (matched_score + intent_bonus) / total_possible if total_possible else 0
+        return [intent]
+    terms = [term for term in list(features) + ([intent] if intent else []) if term in catalog.tag_ids]
+    return terms or None
 
-        if "affordable" in features and price > 25000:
-            final_score *= 0.6
+def candidate_rows(catalog, intent, budget, features, brand_filter=None, spec_filters=None):
+    index = catalog.index
+    terms = candidate_terms(catalog, intent, features)
+    rows = index.all_rows if terms is None else index.any_of(terms)
+    return filter_rows(catalog, rows, budget, brand_filter, spec_filters)
 
-        return int(final_score * 500), list(matched)
+def filter_rows(catalog, rows, budget, brand_filter=None, spec_filters=None):
+    index = catalog.index
 
-    scores_and_matches = filtered_df.apply(compute_score, axis=1)
-    filtered_df["match_score"] = [score for score, match in scores_and_matches]
-    filtered_df["matched_features"] = [match for score, match in scores_and_matches]
+    if brand_filter:
+        rows = intersect_rows(rows, index.brand_rows(brand_filter))
 
-    if filtered_df.empty:
+    if budget:
+        if rows is index.all_rows and not spec_filters:
+            # Budget only: a range of the price-sorted rows. They stay in price order,
+            # which select_top ranks exactly as row order (equal prices keep row order)
+            rows = index.rows_within_budget(budget)
+        else:
+            # A mask over the candidates; they are already in row order, so nothing is sorted
+            rows = rows[catalog.prices[rows] <= budget]
+
+    if spec_filters:
+        rows = filter_specs(catalog, rows, spec_filters)
+
+    return rows
+
+def filter_specs(catalog, rows, spec_filters):
+    # A selective numeric range is read off the spec's sorted index and intersected;
+    # broad ranges and categories are checked with a mask over the current rows
+    index = catalog.index
+    masked = {}
+    for name, condition in spec_filters.items():
+        if name in index.spec_orders and len(rows):
+            matches = index.spec_range(name, *condition)
+            if len(matches) * 8 < len(rows):
+                rows = intersect_rows(rows, np.sort(matches))
+                continue
+        masked[name] = condition
+    if masked and len(rows):
+        rows = rows[catalog.spec_mask(masked, rows)]
+    return rows
+
+def total_possible_weight(intent, features):
+    return sum(feature_weights.get(f, 1.0) for f in features) + (feature_weights.get(intent, 1.0) if intent else 0)
+
+def finish_scores(catalog, rows, matched_score, intent_bonus, total_possible, features):
+    final_score = (matched_score + intent_bonus) / total_possible if total_possible else np.zeros(len(rows))
+
+    if "affordable" in features:
+        final_score = np.where(catalog.prices[rows] > 25000, final_score * 0.6, final_score)
+
+    return (final_score * 500).astype(np.int64)
+
+def fallback_result(catalog, top_rows, top_scores):
+    return catalog.rows_frame(top_rows, fallback_score=top_scores)
+
+def match_result(catalog, top_rows, top_scores, matchable):
+    feature_cols = [catalog.tag_ids[f] for f in matchable]
+    top_tags = catalog.tag_matrix[np.ix_(top_rows, feature_cols)]
+    return catalog.rows_frame(
+        top_rows,
+        matched_features=[[f for f, hit in zip(matchable, hits) if hit] for hits in top_tags],
+        match_score=top_scores,
+    )
+
+def semantic_rows(catalog, semantic, budget, brand_filter=None, spec_filters=None):
+    # Nearest neighbours of the prompt that pass the same filters as keyword candidates
+    index, vector, _ = semantic
+    rows, _ = index.search(vector, SEMANTIC_CANDIDATES)
+    return filter_rows(catalog, np.sort(rows).astype(np.int32), budget, brand_filter, spec_filters)
+
+def query_rows(catalog, intent, budget, features, brand_filter=None, spec_filters=None, semantic=None):
+    # Candidate rows and the semantic term still in use (None when no neighbour passed the filters)
+    rows = candidate_rows(catalog, intent, budget, features, brand_filter, spec_filters)
+    if semantic:
+        hits = semantic_rows(catalog, semantic, budget, brand_filter, spec_filters)
+        if features or intent:
+            rows = np.union1d(rows, hits)
+        elif len(hits):
+            # Without keywords every row is a candidate; the neighbours stand in for them
+            rows = hits
+        else:
+            semantic = None
+    return rows, semantic
+
+def ranked_result(catalog, rows, matched_score, intent_bonus, intent, features, top_n=5, offset=0, semantic=None, trace=None):
+    # Final scores from the keyword parts (and semantic similarity), then the top rows as a frame
+    matchable = [f for f in features if f in catalog.tag_ids]
+    match_score = finish_scores(catalog, rows, matched_score, intent_bonus, total_possible_weight(intent, features), features)
+    if semantic:
+        index, vector, weight = semantic
+        semantic_score = np.clip(index.similarity(rows, vector), 0, 1) * 500
+        match_score = np.rint((1 - weight) * match_score + weight * semantic_score).astype(np.int64)
+    if trace:
+        trace.mark("score")
+
+    top_rows, top_scores = select_top(catalog, rows, match_score, top_n, offset)
+    if trace:
+        trace.mark("rank")
+    result = match_result(catalog, top_rows, top_scores, matchable)
+    if semantic:
+        result["semantic_score"] = (np.clip(index.similarity(top_rows, vector), 0, 1) * 500).astype(np.int64)
+    if trace:
+        trace.mark("materialize")
+    return result
+
+def run_query(catalog, intent, budget, features, brand_filter=None, top_n=5, offset=0, spec_filters=None, trace=None, semantic=None):
+    # semantic: (index, vector, weight) from semantic_query
+    rows, semantic = query_rows(catalog, intent, budget, features, brand_filter, spec_filters, semantic)
+    if trace:
+        trace.mark("filter")
+    if len(rows) == 0:
         return "No matching phones found for your query."
 
-    if features or intent:
-        top_matches = filtered_df.sort_values(by="match_score", ascending=False)
-    else:
-        def fallback_score(tags):
-            return sum(feature_weights.get(tag, 1.0) for tag in tags)
-        filtered_df["fallback_score"] = filtered_df["tags"].apply(fallback_score)
-        top_matches = filtered_df.sort_values(by="fallback_score", ascending=False)
-        return top_matches[["brand", "model", "price", "tags", "fallback_score"]].head(top_n).reset_index(drop=True)
-
-    return top_matches[["brand", "model", "price", "tags", "matched_features", "match_score"]].head(top_n).reset_index(drop=True)
+    if not (features or intent or semantic):
+        top_rows, top_scores = select_top(catalog, rows, catalog.fallback_scores[rows], top_n, offset)
+        if trace:
+            trace.mark("rank")
+        result = fallback_result(catalog, top_rows, top_scores)
+        if trace:
+            trace.mark("materialize")
+        return result
+
+    # Only features that exist as tags can match; the rest still count towards total_possible
+    matchable = [f for f in features if f in catalog.tag_ids]
+    feature_cols = [catalog.tag_ids[f] for f in matchable]
+    feature_vector = np.array([feature_weights.get(f, 1.0) for f in matchable])
+    matched_score = catalog.tag_matrix[np.ix_(rows, feature_cols)] @ feature_vector
+    intent_bonus = catalog.tag_column(intent)[rows] * feature_weights.get(intent, 1.0) if intent else 0
+    return ranked_result(catalog, rows, matched_score, intent_bonus, intent, features, top_n, offset, semantic, trace)
+
+# Batch recommendations
+# Parses every prompt, stacks the requested features into a tag-by-query weight
+# matrix and scores a block of prompts with one matrix multiply. Only the rows
+# that are a candidate for some query in the block, and the tags the block asks
+# for, are gathered from the tag matrix. The semantic term, when the catalog
+# has an index, is blended per query exactly as in recommend_phone.
+BATCH_BLOCK_SIZE = 256
+
+def recommend_batch(prompts, df, top_n=5, brand_filters=None, semantic_weight=None):
+    catalog = get_catalog(df, feature_weights)
+    brand_filters = brand_filters or [None] * len(prompts)
+
+    # Prompts that normalize to the same query are scored once
+    queries = {}
+    query_ids = []
+    for prompt, brand_filter in zip(prompts, brand_filters):
+        query = parse_query(prompt)
+        intent, budget, features = query_terms(query)
+        spec_filters = dict(query.spec_filters)
+        semantic, semantic_key = semantic_query(catalog, query.text, semantic_weight)
+        key = query_key(catalog, intent, budget, features, brand_filter, top_n, 0, spec_filters, semantic_key)
+        if key not in queries:
+            queries[key] = (intent, budget, features, brand_filter, spec_filters, semantic)
+        query_ids.append(key)
+
+    results = {}
+    pending = []
+    for key, (intent, budget, features, brand_filter, spec_filters, semantic) in queries.items():
+        if not (features or intent):
+            results[key] = run_query(catalog, intent, budget, features, brand_filter, top_n, spec_filters=spec_filters, semantic=semantic)
+        else:
+            pending.append(key)
+
+    for start in range(0, len(pending), BATCH_BLOCK_SIZE):
+        block = pending[start:start + BATCH_BLOCK_SIZE]
+        candidates = {}
+        for key in block:
+            intent, budget, features, brand_filter, spec_filters, semantic = queries[key]
+            candidates[key] = query_rows(catalog, intent, budget, features, brand_filter, spec_filters, semantic)
+        block_rows = np.unique(np.concatenate([rows for rows, _ in candidates.values()] + [catalog.index.all_rows[:0]]))
+        block_tags = sorted({catalog.tag_ids[term] for key in block for term in list(queries[key][2]) + [queries[key][0]] if term in catalog.tag_ids})
+        tag_positions = {tag_id: i for i, tag_id in enumerate(block_tags)}
+
+        feature_weights_matrix = np.zeros((len(block_tags), len(block)))
+        intent_weights_matrix = np.zeros((len(block_tags), len(block)))
+        for j, key in enumerate(block):
+            intent, budget, features = queries[key][:3]
+            for f in features:
+                if f in catalog.tag_ids:
+                    feature_weights_matrix[tag_positions[catalog.tag_ids[f]], j] = feature_weights.get(f, 1.0)
+            if intent in catalog.tag_ids:
+                intent_weights_matrix[tag_positions[catalog.tag_ids[intent]], j] = feature_weights.get(intent, 1.0)
+        block_matrix = catalog.tag_matrix[np.ix_(block_rows, block_tags)].astype(np.float64)
+        matched_scores = block_matrix @ feature_weights_matrix
+        intent_bonuses = block_matrix @ intent_weights_matrix
+
+        for j, key in enumerate(block):
+            intent, budget, features = queries[key][:3]
+            rows, semantic = candidates[key]
+            if len(rows) == 0:
+                results[key] = "No matching phones found for your query."
+                continue
+            positions = np.searchsorted(block_rows, rows)
+            results[key] = ranked_result(catalog, rows, matched_scores[positions, j], intent_bonuses[positions, j], intent, features, top_n, semantic=semantic)
+
+    return [results[key] if isinstance(results[key], str) else results[key].copy() for key in query_ids]
 
 def print_recommendations(df):
     if isinstance(df, str):
@@ -133,28 +437,25 @@ def print_recommendations(df):
             print(f"Feature Richness Score: {row['fallback_score']} (fallback)")
 
 if __name__ == "__main__":
+    from semantic import attach_semantic
     df = load_dataset()
+    attach_semantic(get_catalog(df, feature_weights), 'tagged_dataset.csv')
     print("📱 Welcome to the Smartphone Recommender!")
 
     while True:
         user_prompt = input("\nEnter your smartphone requirement: ").strip()
 
-        extracted_budget = extract_budget_from_prompt(user_prompt)
-        extracted_brand = extract_brand_from_prompt(user_prompt)
-
-        parsed = parse_prompt(user_prompt)
+        query = parse_query(user_prompt)
 
-        if extracted_budget:
-            parsed['budget'] = extracted_budget
-            if extracted_budget >= 1000:
-                print(f"Detected budget from prompt: ₹{extracted_budget}")
+        if query.budget:
+            print(f"Detected budget from prompt: ₹{query.budget}")
 
-        if extracted_brand:
-            print(f"Detected brand from prompt: {extracted_brand}")
+        if query.brand:
+            print(f"Detected brand from prompt: {query.brand}")
 
         # If intent and features are not found
-        has_intent_or_features = parsed.get("intent") or parsed.get("supporting_features") or parsed.get("keywords")
-        has_brand_and_budget = extracted_brand and extracted_budget
+        has_intent_or_features = query.intent or query.features
+        has_brand_and_budget = query.brand and query.budget
 
         if not has_intent_or_features and not has_brand_and_budget:
             print("\n⚠️ Sorry, we couldn't identify any specific requirements in your prompt.")
@@ -162,7 +463,7 @@ if __name__ == "__main__":
             continue  # Ask again
         
         else:
-            result = recommend_phone(user_prompt, df, top_n=3, debug=True, brand_filter=extracted_brand)
+            result = recommend_phone(query, df, top_n=3, debug=True, brand_filter=query.brand, trace=Trace())
 
             if isinstance(result, str):
                 print("\n❌", result)
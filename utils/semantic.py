@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from parser import INTENT_KEYWORDS, SUPPORTING_FEATURES
+from catalog import Catalog, save_array
+
+# Semantic retrieval (optional)
+# Each phone is described by a short text built from its specs and tags, where
+# every intent/feature tag also brings its keyword list and a few paraphrases.
+# The texts are embedded offline with TF-IDF followed by LSA (a randomized
+# truncated SVD), and the row vectors are clustered into an IVF index. Both
+# are saved as .npy files next to the tagged CSV ("tagged_dataset.csv.semantic/")
+# and memory-mapped at load. A query is embedded with the same vocabulary, the
+# closest clusters are probed, and the hits are blended with the keyword score.
+SEMANTIC_VERSION = 2
+semantic_versions = itertools.count(1)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "for", "with", "that", "this", "to", "of", "in", "on", "is", "it",
+    "i", "me", "my", "want", "need", "looking", "phone", "phones", "mobile", "smartphone", "good", "best",
+    "some", "something", "can", "should", "which", "very", "really", "please", "who", "what",
+}
+
+# Words people use for a tag that the keyword lists do not cover
+TAG_PARAPHRASES = {
+    "battery": "lasts all day two days long lasting backup endurance heavy use travel without charger",
+    "camera": "instagram social media reels selfies photos pictures snaps portraits memories",
+    "gaming": "games bgmi free fire cod mobile esports frame drops",
+    "display": "movies netflix youtube binge watching reading bright screen",
+    "performance": "multitasking heavy apps editing fast flagship",
+    "budget": "cheap student value money low price",
+    "storage": "photos videos files downloads space",
+    "connectivity": "network signal wifi hotspot",
+    "vlogging": "youtube vlog video recording creator",
+    "content creation": "creator youtube reels editing",
+    "night photography": "low light night shots",
+}
+
+def stem(token):
+    for suffix in ("ing", "ed", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+def tag_text(tag):
+    words = [tag, TAG_PARAPHRASES.get(tag, "")]
+    words += INTENT_KEYWORDS.get(tag, []) + SUPPORTING_FEATURES.get(tag, [])
+    return " ".join(words)
+
+# Brand and model names are left out: brands are matched by the brand filter, and
+# a brand word in the prompt would otherwise outweigh what the phone is wanted for
+DESCRIPTION_COLUMNS = ["processor", "processor type", "ram", "storage", "display size",
+                       "display resolution", "refresh rate", "rear camera", "front camera", "battery", "charging speed", "os"]
+
+def phone_texts(df, summaries=None):
+    # One description per row: spec columns, tags with their vocabulary, and a summary when one is known
+    columns = [column for column in DESCRIPTION_COLUMNS if column in df.columns]
+    texts = []
+    for values, row_tags, brand, model in zip(df[columns].itertuples(index=False), df["tags"], df["brand"].astype(str).str.lower(), df["model"]):
+        parts = [str(value) for value in values if isinstance(value, str)]
+        parts += [tag_text(tag) for tag in row_tags if tag != brand]
+        if summaries and model in summaries:
+            parts.append(summaries[model].replace(str(model), ""))
+        texts.append(" ".join(parts))
+    return texts
+
+# Sparse TF-IDF
+# Rows are stored CSR-style (offsets, term ids, weights) so nothing dense of
+# size rows x vocabulary is ever built.
+def build_vocabulary(token_lists, min_df=2, max_terms=8192):
+    df_counts = {}
+    for tokens in token_lists:
+        for token in set(tokens):
+            df_counts[token] = df_counts.get(token, 0) + 1
+    terms = sorted((token for token, count in df_counts.items() if count >= min_df), key=lambda token: (-df_counts[token], token))[:max_terms]
+    terms.sort()
+    n = len(token_lists)
+    idf = np.array([np.log((1 + n) / (1 + df_counts[term])) + 1 for term in terms], dtype=np.float32)
+    return {term: i for i, term in enumerate(terms)}, idf
+
+def tfidf_rows(token_lists, vocabulary, idf):
+    offsets, ids, weights = [0], [], []
+    for tokens in token_lists:
+        counts = {}
+        for token in tokens:
+            term = vocabulary.get(token)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        row_ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        row_weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * idf[row_ids]
+        norm = np.linalg.norm(row_weights)
+        ids.append(row_ids)
+        weights.append(row_weights / norm if norm else row_weights)
+        offsets.append(offsets[-1] + len(counts))
+    empty = [np.zeros(0, dtype=np.int32)], [np.zeros(0, dtype=np.float32)]
+    return np.array(offsets, dtype=np.int64), np.concatenate(ids or empty[0]), np.concatenate(weights or empty[1])
+
+def sparse_dot(offsets, ids, weights, dense):
+    # (rows x vocabulary) sparse matrix times a (vocabulary x k) dense one
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    out = np.zeros((len(offsets) - 1, dense.shape[1]), dtype=np.float64)
+    np.add.at(out, rows, weights[:, None] * dense[ids])
+    return out
+
+def sparse_dot_transposed(offsets, ids, weights, dense, vocabulary_size):
+    # transpose(sparse) times a (rows x k) dense matrix
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    out = np.zeros((vocabulary_size, dense.shape[1]), dtype=np.float64)
+    np.add.at(out, ids, weights[:, None] * dense[rows])
+    return out
+
+def randomized_svd(offsets, ids, weights, vocabulary_size, dims, oversample=10, iterations=2, seed=0):
+    # Right singular vectors (dims x vocabulary) of the sparse TF-IDF matrix
+    rng = np.random.default_rng(seed)
+    rank = min(dims + oversample, vocabulary_size, len(offsets) - 1)
+    q, _ = np.linalg.qr(sparse_dot(offsets, ids, weights, rng.standard_normal((vocabulary_size, rank))))
+    for _ in range(iterations):
+        z, _ = np.linalg.qr(sparse_dot_transposed(offsets, ids, weights, q, vocabulary_size))
+        q, _ = np.linalg.qr(sparse_dot(offsets, ids, weights, z))
+    b = sparse_dot_transposed(offsets, ids, weights, q, vocabulary_size).T
+    _, _, components = np.linalg.svd(b, full_matrices=False)
+    return components[:dims]
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def kmeans(vectors, clusters, iterations=20, seed=0):
+    # Spherical k-means on unit vectors; returns (centroids, assignment)
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.linalg.norm(sums, axis=1) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+def catalog_digest(catalog):
+    # Content hash of the catalog an index is built for: names, prices, specs and
+    # tags, so an index built before a reload that changed any of them is left off
+    digest = hashlib.sha256()
+    for name in ["brand", "model"]:
+        for value in catalog.result_columns[name]:
+            digest.update(str(value).encode("utf-8") + b"\0")
+    digest.update(np.ascontiguousarray(catalog.prices, dtype=np.int64).tobytes())
+    for name in sorted(catalog.specs):
+        values = np.ascontiguousarray(catalog.specs[name])
+        digest.update(f"{name}:{values.dtype.str}".encode("utf-8") + values.tobytes())
+    digest.update(json.dumps(catalog.spec_categories, sort_keys=True, default=str).encode("utf-8"))
+    digest.update("\0".join(catalog.tag_names).encode("utf-8"))
+    digest.update(np.ascontiguousarray(catalog.tag_matrix).tobytes())
+    return digest.hexdigest()
+
+def semantic_path(csv_path):
+    return str(csv_path) + ".semantic"
+
+def build_semantic_index(df, path, dims=128, summaries=None):
+    # df is the catalog frame (load_dataset), so vector rows line up with catalog rows
+    token_lists = [tokenize(text) for text in phone_texts(df, summaries)]
+    vocabulary, idf = build_vocabulary(token_lists)
+    offsets, ids, weights = tfidf_rows(token_lists, vocabulary, idf)
+    components = randomized_svd(offsets, ids, weights, len(vocabulary), dims).astype(np.float32)
+    vectors = normalize_rows(sparse_dot(offsets, ids, weights, components.T)).astype(np.float32)
+
+    clusters = max(1, min(len(vectors), int(np.sqrt(len(vectors)))))
+    centroids, assignment = kmeans(vectors, clusters)
+    list_rows = np.argsort(assignment, kind="stable").astype(np.int32)
+    list_offsets = np.searchsorted(assignment[list_rows], np.arange(clusters + 1)).astype(np.int64)
+
+    os.makedirs(path, exist_ok=True)
+    meta_file = os.path.join(path, "meta.json")
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+    for name, array in [("vectors", vectors), ("components", components), ("idf", idf), ("centroids", centroids.astype(np.float32)),
+                        ("list_rows", list_rows), ("list_offsets", list_offsets)]:
+        save_array(path, name, array)
+    meta = {"version": SEMANTIC_VERSION, "rows": len(df), "catalog": catalog_digest(Catalog(df, {})), "terms": sorted(vocabulary, key=vocabulary.get)}
+    with open(meta_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_file + ".tmp", meta_file)
+    return path
+
+def read_semantic_meta(path):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+class SemanticIndex:
+    # The arrays are memory-mapped; a rebuild renames new files over them, so an
+    # index already loaded keeps its own data
+    def __init__(self, path):
+        meta = read_semantic_meta(path)
+        if meta.get("version") != SEMANTIC_VERSION:
+            raise ValueError(f"{path} was built by a different version, rebuild it")
+        load = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+        self.rows = meta["rows"]
+        self.catalog = meta["catalog"]
+        self.vocabulary = {term: i for i, term in enumerate(meta["terms"])}
+        self.vectors = load("vectors")
+        self.components = np.ascontiguousarray(load("components").T)
+        self.idf = load("idf")
+        self.centroids = load("centroids")
+        self.list_rows = load("list_rows")
+        self.list_offsets = load("list_offsets")
+        if read_semantic_meta(path) != meta:
+            raise ValueError(f"{path} was rebuilt while loading")
+        self.version = next(semantic_versions)
+
+    def matches(self, catalog):
+        return self.rows == len(catalog) and self.catalog == catalog_digest(catalog)
+
+    def query(self, text):
+        # Returns (vector, key); key identifies the query for caching, and vector is None when no term is known
+        counts = {}
+        for token in tokenize(text):
+            term = self.vocabulary.get(token)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        if not counts:
+            return None, None
+        terms = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[terms]
+        vector = weights @ self.components[terms]
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None, None
+        return (vector / norm).astype(np.float32), (self.version, tuple(sorted(counts.items())))
+
+    def search(self, vector, top_k=100, probes=8):
+        # Approximate top_k rows by cosine similarity, from the probes closest clusters
+        nearest = np.argsort(-(self.centroids @ vector))[:probes]
+        rows = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in nearest])
+        similarity = self.vectors[rows] @ vector
+        if len(rows) > top_k:
+            keep = np.argpartition(-similarity, top_k)[:top_k]
+            rows, similarity = rows[keep], similarity[keep]
+        return rows, similarity
+
+    def similarity(self, rows, vector):
+        return self.vectors[rows] @ vector
+
+def attach_semantic(catalog, csv_path):
+    # Loads the semantic index built for csv_path onto the catalog when it matches its rows
+    path = semantic_path(csv_path)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    try:
+        index = SemanticIndex(path)
+    except (OSError, ValueError):
+        return None
+    if not index.matches(catalog):
+        return None
+    catalog.semantic = index
+    return index
+
+if __name__ == "__main__":
+    from recommender import load_dataset
+    arg_parser = argparse.ArgumentParser(description="Build the semantic index for a tagged dataset")
+    arg_parser.add_argument("path", nargs="?", default="tagged_dataset.csv")
+    arg_parser.add_argument("--summaries", help="JSON list of records with model and summary fields")
+    arg_parser.add_argument("--dims", type=int, default=128)
+    args = arg_parser.parse_args()
+
+    summaries = None
+    if args.summaries:
+        with open(args.summaries, encoding="utf-8") as f:
+            summaries = {record.get("model"): record.get("summary", "") for record in json.load(f)}
+    start = time.perf_counter()
+    path = build_semantic_index(load_dataset(args.path), semantic_path(args.path), dims=args.dims, summaries=summaries)
+    print(f"Semantic index built in {time.perf_counter() - start:.1f}s -> {path}")
@@ -0,0 +1,301 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from parser import parse_query, ParsedQuery
+from catalog import get_catalog
+from recommender import (
+    feature_weights, semantic_query, candidate_terms, candidate_rows, filter_rows, semantic_rows, select_top,
+    total_possible_weight, finish_scores, fallback_result, match_result,
+)
+
+# Conversational sessions
+# A session keeps the merged query of every turn so far together with its
+# candidate rows and their partial scores. A follow-up ("cheaper", "only
+# Samsung", "more battery") that only tightens the query is applied to that
+# candidate set: filters drop rows, and only newly requested features are
+# looked up in the tag matrix. Loosening a constraint ("any brand", a higher
+# budget, a changed spec range) or a catalog reload rebuilds the candidates.
+# The semantic vector, when there is an index, is taken from the first turn.
+CHEAPER_PATTERN = re.compile(r"\b(cheaper|less expensive|lower (price|budget)|more affordable)\b")
+ANY_BRAND_PATTERN = re.compile(r"\b(any|all|other) brands?\b")
+# "cheaper" lowers the budget (or the dearest phone shown, if lower) by this factor
+CHEAPER_FACTOR = 0.8
+
+def term_points(catalog, rows, terms):
+    # Sum of feature weights of the terms each row is tagged with; terms may repeat
+    points = np.zeros(len(rows))
+    for term in terms:
+        if term in catalog.tag_ids:
+            points += catalog.tag_column(term)[rows] * feature_weights.get(term, 1.0)
+    return points
+
+def semantic_points(semantic, rows):
+    index, vector, _ = semantic
+    return np.clip(index.similarity(rows, vector), 0, 1) * 500
+
+class Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.intent = None
+        self.budget = None
+        self.features = frozenset()
+        self.brand = None
+        self.spec_filters = {}
+        self.embedding = None
+        self.semantic = None
+        self.rows = None
+        self.points = None
+        self.semantic_scores = None
+        self.shown_max_price = None
+        self.turns = 0
+
+    def terms(self):
+        return list(self.features) + ([self.intent] if self.intent else [])
+
+    def keyword_free(self):
+        return not (self.features or self.intent or self.semantic)
+
+    def all_filtered(self, catalog):
+        # True when every row passing the filters is a candidate (see candidate_terms);
+        # without keywords the semantic neighbours stand in for them instead
+        if self.semantic and not (self.features or self.intent):
+            return False
+        return candidate_terms(catalog, self.intent, self.features) is None
+
+    def query(self):
+        return {"intent": self.intent, "budget": self.budget, "features": sorted(self.features), "brand": self.brand, "specs": dict(self.spec_filters)}
+
+    def turn(self, catalog, query, brand_filter=None, top_n=5, semantic_weight=None, trace=None):
+        # Returns (result, mode): mode is "new", "refined" or "rebuilt"
+        if self.rows is None:
+            self.intent, self.budget, self.features = query.intent, query.budget, query.features
+            self.brand = brand_filter or query.brand
+            self.spec_filters = dict(query.spec_filters)
+            self.embedding, _ = semantic_query(catalog, query.text, semantic_weight)
+            self.rebuild(catalog)
+            mode = "new"
+        elif not self.refine(catalog, query, brand_filter):
+            self.rebuild(catalog)
+            mode = "rebuilt"
+        else:
+            mode = "refined"
+        self.turns += 1
+        if trace:
+            trace.mark("filter")
+        return self.results(catalog, top_n, trace), mode
+
+    def rebuild(self, catalog):
+        # Candidates and scores from scratch, exactly as recommender.run_query selects them
+        self.version = catalog.version
+        self.semantic = self.embedding
+        rows = candidate_rows(catalog, self.intent, self.budget, self.features, self.brand, self.spec_filters)
+        if self.semantic:
+            hits = semantic_rows(catalog, self.semantic, self.budget, self.brand, self.spec_filters)
+            if self.features or self.intent:
+                rows = np.union1d(rows, hits)
+            elif len(hits):
+                rows = hits
+            else:
+                self.semantic = None
+        self.rows = rows
+        self.points = None if self.keyword_free() else term_points(catalog, rows, self.terms())
+        self.semantic_scores = semantic_points(self.semantic, rows) if self.semantic else None
+
+    def refine(self, catalog, query, brand_filter=None):
+        # Merges a follow-up into the session; False when it loosens the query
+        # or the catalog was reloaded, and the candidates need a rebuild
+        lowered = query.text.lower()
+        budget = query.budget or self.budget
+        if CHEAPER_PATTERN.search(lowered):
+            ceiling = min((price for price in (budget, self.shown_max_price) if price), default=None)
+            budget = int(ceiling * CHEAPER_FACTOR) if ceiling else budget
+        brand = brand_filter or query.brand
+        if not brand and not ANY_BRAND_PATTERN.search(lowered):
+            brand = self.brand
+        # A follow-up intent becomes the session's intent only when it has none yet
+        intent = self.intent or query.intent
+        features = self.features | query.features | ({query.intent} if query.intent and self.intent else set())
+        spec_filters = {**self.spec_filters, **dict(query.spec_filters)}
+
+        loosened = (
+            (self.budget is not None and budget > self.budget)
+            or (self.brand is not None and (brand is None or brand.lower() != self.brand.lower()))
+            or any(spec_filters[name] != condition for name, condition in self.spec_filters.items())
+        )
+        was_all_filtered = self.all_filtered(catalog)
+        added_terms = list(features - self.features) + ([intent] if intent != self.intent else [])
+        previous_budget, previous_brand, previous_specs = self.budget, self.brand, self.spec_filters
+        self.intent, self.budget, self.features, self.brand, self.spec_filters = intent, budget, frozenset(features), brand, spec_filters
+        if loosened or catalog.version != self.version:
+            return False
+
+        # Tighter filters only drop rows from the current candidates
+        keep = np.ones(len(self.rows), dtype=bool)
+        if brand and not previous_brand:
+            keep &= np.isin(self.rows, catalog.index.brand_rows(brand), assume_unique=True)
+        if budget != previous_budget:
+            keep &= catalog.prices[self.rows] <= budget
+        new_specs = {name: condition for name, condition in spec_filters.items() if name not in previous_specs}
+        if new_specs and len(self.rows):
+            keep &= catalog.spec_mask(new_specs, self.rows)
+        self.rows = self.rows[keep]
+        self.points = self.points[keep] if self.points is not None else None
+        self.semantic_scores = self.semantic_scores[keep] if self.semantic else None
+        if self.semantic and not (self.features or self.intent or len(self.rows)):
+            # run_query falls back to every row when no neighbour is left
+            return False
+        all_filtered = self.all_filtered(catalog)
+        if all_filtered != was_all_filtered and (all_filtered or self.semantic):
+            # Rows outside the candidates are needed, or the semantic neighbours were not kept apart
+            return False
+        if added_terms:
+            self.add_terms(catalog, added_terms, was_all_filtered)
+        return True
+
+    def add_terms(self, catalog, added_terms, was_all_filtered):
+        index = catalog.index
+        if was_all_filtered:
+            # Every filtered row was a candidate; now only those carrying a term may be
+            terms = candidate_terms(catalog, self.intent, self.features)
+            rows = self.rows if terms is None else self.rows[np.isin(self.rows, index.any_of(terms), assume_unique=True)]
+            self.rows, self.points = rows, term_points(catalog, rows, self.terms())
+            return
+        # Existing candidates gain the new terms' weights; rows carrying only a new term join
+        self.points = self.points + term_points(catalog, self.rows, added_terms)
+        extra = filter_rows(catalog, index.any_of(added_terms), self.budget, self.brand, self.spec_filters)
+        extra = extra[~np.isin(extra, self.rows, assume_unique=True)]
+        if len(extra):
+            rows = np.concatenate([self.rows, extra])
+            order = np.argsort(rows, kind="stable")
+            self.rows = rows[order]
+            self.points = np.concatenate([self.points, term_points(catalog, extra, self.terms())])[order]
+            if self.semantic:
+                self.semantic_scores = np.concatenate([self.semantic_scores, semantic_points(self.semantic, extra)])[order]
+
+    def results(self, catalog, top_n, trace=None):
+        rows = self.rows
+        if len(rows) == 0:
+            self.shown_max_price = None
+            return "No matching phones found for your query."
+        if self.keyword_free():
+            top_rows, top_scores = select_top(catalog, rows, catalog.fallback_scores[rows], top_n)
+            if trace:
+                trace.mark("rank")
+            result = fallback_result(catalog, top_rows, top_scores)
+        else:
+            scores = finish_scores(catalog, rows, self.points, 0, total_possible_weight(self.intent, self.features), self.features)
+            if self.semantic:
+                weight = self.semantic[2]
+                scores = np.rint((1 - weight) * scores + weight * self.semantic_scores).astype(np.int64)
+            if trace:
+                trace.mark("score")
+            top_rows, top_scores = select_top(catalog, rows, scores, top_n)
+            if trace:
+                trace.mark("rank")
+            result = match_result(catalog, top_rows, top_scores, [f for f in self.features if f in catalog.tag_ids])
+            if self.semantic:
+                result["semantic_score"] = self.semantic_scores[np.searchsorted(rows, top_rows)].astype(np.int64)
+        self.shown_max_price = int(catalog.prices[top_rows].max()) if len(top_rows) else None
+        if trace:
+            trace.mark("materialize")
+        return result
+
+# Bounded session store
+# Sessions are kept in least-recently-used order; past maxsize the oldest is
+# evicted, and one idle for longer than ttl seconds is dropped when it is next
+# looked up or reaches the front of the order.
+class SessionStore:
+    def __init__(self, maxsize=10000, ttl=1800):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def is_expired(self, last_used, now):
+        return self.ttl is not None and now - last_used >= self.ttl
+
+    def get(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+            now = time.monotonic()
+            if self.is_expired(entry[0], now):
+                del self.sessions[session_id]
+                self.expired += 1
+                return None
+            self.sessions[session_id] = (now, entry[1])
+            self.sessions.move_to_end(session_id)
+            return entry[1]
+
+    def create(self):
+        session_id, session = uuid.uuid4().hex, Session()
+        with self.lock:
+            now = time.monotonic()
+            while self.sessions and self.is_expired(next(iter(self.sessions.values()))[0], now):
+                self.sessions.popitem(last=False)
+                self.expired += 1
+            self.sessions[session_id] = (now, session)
+            self.created += 1
+            while len(self.sessions) > self.maxsize:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+        return session_id, session
+
+    def drop(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.sessions.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.sessions), "maxsize": self.maxsize, "created": self.created, "expired": self.expired, "evicted": self.evicted}
+
+def converse(store, session_id, prompt, df, top_n=5, brand_filter=None, semantic_weight=None, trace=None):
+    # One turn of a conversation: returns (session_id, merged query, result, mode).
+    # A missing, unknown or expired session_id starts a new session from the prompt.
+    query = prompt if isinstance(prompt, ParsedQuery) else parse_query(prompt)
+    session = store.get(session_id) if session_id else None
+    if session is None:
+        session_id, session = store.create()
+    catalog = get_catalog(df, feature_weights)
+    if trace:
+        trace.mark("parse")
+    with session.lock:
+        result, mode = session.turn(catalog, query, brand_filter, top_n, semantic_weight, trace)
+        state = session.query()
+    return session_id, state, result, mode
+
+if __name__ == "__main__":
+    from recommender import load_dataset
+    from semantic import attach_semantic
+
+    df = load_dataset()
+    attach_semantic(get_catalog(df, feature_weights), "tagged_dataset.csv")
+    store = SessionStore()
+    session_id = None
+    print("Describe the phone you want, then refine it (\"cheaper\", \"only Samsung\", \"more battery\"). Type \"new\" to start over.")
+    while True:
+        prompt = input("\n> ").strip()
+        if prompt.lower() == "new":
+            session_id = None
+            continue
+        if not prompt:
+            continue
+        start = time.perf_counter()
+        session_id, state, result, mode = converse(store, session_id, prompt, df, top_n=3)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"[{mode}, {elapsed:.2f} ms] {state}")
+        print(result if isinstance(result, str) else result.to_string(index=False))
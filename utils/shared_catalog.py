@@ -0,0 +1,44 @@
+from multiprocessing import shared_memory
+import numpy as np
+from catalog import Catalog
+
+# Catalog arrays in multiprocessing.shared_memory for pre-fork serving.
+# The parent publishes every array a query needs once; workers attach to the
+# segments by name and wrap them as read-only NumPy views, so adding workers
+# adds no per-process copy of the catalog.
+def publish_catalog(catalog):
+    arrays, meta = catalog.shared_arrays()
+    segments = []
+    handle = {"meta": meta, "arrays": {}}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        handle["arrays"][name] = (segment.name, array.dtype.str, array.shape)
+        segments.append(segment)
+    return handle, segments
+
+def open_segment(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the segment with the
+        # resource tracker; workers started by the publisher share its tracker,
+        # so the segment is still only unlinked once, by the publisher
+        return shared_memory.SharedMemory(name=name)
+
+def attach_catalog(handle, weights):
+    # Returns (catalog, segments); keep the segments referenced while the catalog is in use
+    segments = []
+    arrays = {}
+    for name, (segment_name, dtype, shape) in handle["arrays"].items():
+        segment = open_segment(segment_name)
+        segments.append(segment)
+        arrays[name] = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf)
+    return Catalog.from_arrays(arrays, handle["meta"], weights), segments
+
+def release_segments(segments, unlink=False):
+    for segment in segments:
+        segment.close()
+        if unlink:
+            segment.unlink()
@@ -0,0 +1,117 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from tagger import column_text, by_unique
+
+# Typed spec columns
+# Scraped spec strings ("6 GB RAM", "3279 mAh", "120 Hz Display with Punch Hole")
+# are parsed once into compact numeric arrays. Some rows have their specs
+# shifted into the wrong column, so every spec is matched by its unit across
+# all of the row's spec text rather than read from a single column.
+SPEC_TEXT_COLUMNS = ["ram", "storage", "battery", "display size", "display resolution", "refresh rate",
+                     "rear camera", "front camera", "charging speed", "memory card support"]
+
+SIZE_UNITS = {"mb": 1 / 1024, "gb": 1, "tb": 1024}
+
+# name: (pattern with a number group and an optional unit group, dtype)
+# Integer columns use -1 for unknown, float columns NaN
+SPEC_PATTERNS = {
+    "ram_gb": (r"(\d+(?:\.\d+)?)\s*(GB|MB)\s*RAM", np.float32),
+    "storage_gb": (r"(\d+(?:\.\d+)?)\s*(GB|TB|MB)\s*inbuilt", np.float32),
+    "battery_mah": (r"(\d+)\s*mAh", np.int16),
+    "refresh_hz": (r"(\d+)\s*Hz", np.int16),
+    "display_in": (r"(\d+(?:\.\d+)?)\s*inch", np.float32),
+    "charging_w": (r"(\d+(?:\.\d+)?)\s*W\s*Fast", np.float32),
+}
+CAMERA_PATTERNS = {
+    "rear_mp": r"((?:\d+(?:\.\d+)?\s*MP\s*\+?\s*)+)[^|&]*?Rear",
+    "front_mp": r"((?:\d+(?:\.\d+)?\s*MP\s*\+?\s*)+)[^|&]*?Front",
+}
+CATEGORY_COLUMNS = {"brand": "brand", "processor": "processor"}
+
+# Chipset family for the processor column; anything else (shifted cells like "Octa" or "32") is unknown
+PROCESSOR_FAMILIES = {
+    "snapdragon": "snapdragon", "qualcomm": "snapdragon", "sanpdragon": "snapdragon",
+    "dimensity": "dimensity", "helio": "helio", "exynos": "exynos", "kirin": "kirin",
+    "bionic": "bionic", "fusion": "bionic", "a13": "bionic", "apple": "bionic",
+    "google": "tensor", "tensor": "tensor",
+    "unisoc": "unisoc", "tiger": "unisoc", "spreadtrum": "unisoc", "sc9863a": "unisoc", "sc6531e": "unisoc",
+}
+
+def spec_text(df):
+    text = column_text(df, SPEC_TEXT_COLUMNS[0])
+    for column in SPEC_TEXT_COLUMNS[1:]:
+        text = text + " | " + column_text(df, column)
+    return text
+
+def unit_values(text, pattern):
+    def parse(values):
+        found = values.str.extract(pattern, flags=re.IGNORECASE)
+        numbers = pd.to_numeric(found[0], errors="coerce")
+        if found.shape[1] > 1:
+            numbers = numbers * found[1].str.lower().map(SIZE_UNITS).fillna(1)
+        return numbers.astype(float)
+    return by_unique(text, parse).to_numpy()
+
+def largest_mp(text, pattern):
+    # Largest MP figure in the first run of "x MP + y MP ..." before Rear/Front
+    def parse(values):
+        runs = values.str.extract(pattern)[0]
+        found = runs.str.extractall(r"(\d+(?:\.\d+)?)")[0].astype(float)
+        return found.groupby(level=0).max().reindex(values.index).astype(float)
+    return by_unique(text, parse).to_numpy()
+
+def typed(values, dtype):
+    if np.issubdtype(dtype, np.integer):
+        return np.where(np.isnan(values), -1, np.clip(values, -1, np.iinfo(dtype).max)).astype(dtype)
+    return values.astype(dtype)
+
+def categories(values, names=None):
+    # (codes, names) with lowercased names and -1 for missing; names maps raw values to a category
+    labels = pd.Series(values, dtype=object).map(lambda value: str(value).strip().lower() if isinstance(value, str) else None)
+    if names is not None:
+        labels = labels.map(names)
+    codes, names = pd.factorize(labels, sort=True)
+    return codes.astype(np.int16), list(names)
+
+def parse_specs(df):
+    # Returns (specs, spec_categories): name -> typed array, and the names behind each categorical column
+    text = spec_text(df)
+    specs = {name: typed(unit_values(text, pattern), dtype) for name, (pattern, dtype) in SPEC_PATTERNS.items()}
+    for name, pattern in CAMERA_PATTERNS.items():
+        specs[name] = typed(largest_mp(text, pattern), np.float32)
+    spec_categories = {}
+    for name, column in CATEGORY_COLUMNS.items():
+        values = df[column].to_numpy(dtype=object) if column in df.columns else np.full(len(df), None, dtype=object)
+        specs[name], spec_categories[name] = categories(values, PROCESSOR_FAMILIES if name == "processor" else None)
+    return specs, spec_categories
+
+def known_values(values):
+    return values >= 0 if np.issubdtype(values.dtype, np.integer) else ~np.isnan(values)
+
+def typed_bounds(dtype, low, high):
+    # Bounds in the column's own type, so 6.1 matches a float32 6.1 and 8.5 rounds up to 9 on int columns
+    if np.issubdtype(dtype, np.integer):
+        return (None if low is None else int(np.ceil(low))), (None if high is None else int(np.floor(high)))
+    return (None if low is None else dtype.type(low)), (None if high is None else dtype.type(high))
+
+def spec_mask(specs, spec_categories, filters, rows=None):
+    # filters: {name: (low, high)} inclusive for numeric specs, either bound may be None,
+    # or {name: [names]} for categorical ones. Unknown values never match.
+    mask = None
+    for name, condition in filters.items():
+        values = specs[name] if rows is None else specs[name][rows]
+        if name in spec_categories:
+            wanted = [spec_categories[name].index(value.lower()) for value in condition if value.lower() in spec_categories[name]]
+            hit = np.isin(values, wanted)
+        else:
+            low, high = typed_bounds(values.dtype, *condition)
+            hit = known_values(values)
+            if low is not None:
+                hit &= values >= low
+            if high is not None:
+                hit &= values <= high
+        mask = hit if mask is None else mask & hit
+    return mask
@@ -1,4 +1,14 @@
+import bisect
+import hashlib
+import json
+import os
 import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
 import pandas as pd
 
 INTENT_KEYWORDS = {
@@ -53,266 +63,606 @@ SUPPORTING_FEATURES = {
     ]
 }
 
-def add_spec_tags(row):
-    tags = set()
-
-    # RAM tag (rounded to common sizes)
-    try:
-        ram_gb = int(re.sub(r"\D", "", str(row.get('ram', ''))))
-        for size in [2, 4, 6, 8, 12, 16]:
-            if ram_gb <= size:
-                tags.add(f"{size}gb")
-                break
-    except:
-        pass
-
-    # Storage tag (rounded to common sizes)
-    try:
-        storage_gb = int(re.sub(r"\D", "", str(row.get('storage', ''))))
-        for size in [32, 64, 128, 256, 512]:
-            if storage_gb <= size:
-                tags.add(f"{size}gb")
-                break
-    except:
-        pass
-
-    # Battery tag (rounded to common sizes)
-    try:
-        battery_mah = int(re.sub(r"\D", "", str(row.get('battery', ''))))
-        for size in [3000, 4000, 4500, 5000, 6000]:
-            if battery_mah <= size:
-                tags.add(f"{size}mah")
-                break
-    except:
-        pass
-
-    # Display size tag (rounded to 1 decimal place)
-    try:
-        display_size = float(re.search(r"\d+(\.\d+)?", str(row.get('display size', ''))).group())
-        tags.add(str(round(display_size, 1)))
-    except:
-        pass
-
-    # Refresh rate tag
-    try:
-        refresh_rate = int(re.sub(r"\D", "", str(row.get('refresh rate', ''))))
-        if refresh_rate > 0:
-            tags.add(f"{refresh_rate}hz")
-    except:
-        pass
-
-    # 5G support tag
-    try:
-        if str(row.get('5G', '')).lower() in ['yes', 'true', 'supported', '1']:
-            tags.add("5g")
-    except:
-        pass
-
-    # Fast charging tag
-    try:
-        charging_desc = str(row.get('charging speed', '')).lower()
-        if "fast" in charging_desc:
-            tags.add("fast charging")
-    except:
-        pass
-
-    # Dual SIM tag
-    try:
-        sim_slots = int(re.sub(r"\D", "", str(row.get('sim slots', '1'))))
-        if sim_slots >= 2:
-            tags.add("dual sim")
-    except:
-        pass
-
-    # Rear camera megapixels tag
-    try:
-        rear_cams = re.findall(r"\d+", str(row.get('rear camera', '')))
-        if rear_cams:
-            max_rear_mp = max([int(mp) for mp in rear_cams])
-            tags.add(f"{max_rear_mp}mp")
-    except:
-        pass
-
-    # Front camera megapixels tag
-    try:
-        front_cams = re.findall(r"\d+", str(row.get('front camera', '')))
-        if front_cams:
-            max_front_mp = max([int(mp) for mp in front_cams])
-            tags.add(f"{max_front_mp}mp front")
-    except:
-        pass
-
-    return list(tags)
-
-
-def tag_phone(row):
-    tags = set()
-
-    # Gaming tag
-    try:
-        ram = int(re.sub(r"\D", "", str(row['ram'])))
-        refresh = int(re.sub(r"\D", "", str(row['refresh rate'])))
-        processor = str(row['processor']).lower()
-        if ram >= 6 and refresh >= 90 and any(p in processor for p in ['snapdragon', 'mediatek', 'a13', 'a14', 'a15', 'a16', 'a17']):
-            tags.add("gaming")
-    except:
-        pass
-
-    # Battery tag
-    try:
-        battery = int(re.sub(r"\D", "", str(row['battery'])))
-        charging = str(row.get('charging speed', '')).lower()
-        if battery >= 5000 or "fast" in charging:
-            tags.add("battery")
-    except:
-        pass
-
-    # Camera tag
-    try:
-        rear = re.findall(r"\d+", str(row['rear camera']))
-        front = re.findall(r"\d+", str(row['front camera']))
-        rear_max = max([int(x) for x in rear]) if rear else 0
-        front_max = max([int(x) for x in front]) if front else 0
-        if rear_max >= 12 and front_max >= 12:
-            tags.add("camera")
-    except:
-        pass
-
-    # Display tag
-    try:
-        resolution = str(row['display resolution']).lower()
-        model = str(row['model']).lower()
-        size = float(re.search(r"\d+(\.\d+)?", str(row['display size'])).group())
-        if any(q in resolution for q in ['fhd', 'full hd', '1080', 'retina', 'oled']) or size >= 6.5 or "pro max" in model:
-            tags.add("display")
-    except:
-        pass
-
-    # Budget tag (basic example, adjust as needed)
-    try:
-        price = int(re.sub(r"\D", "", str(row['price'])))
-        if price <= 10000:
-            tags.add("10000")
-        elif price <= 20000:
-            tags.add("20000")
-        elif price <= 30000:
-            tags.add("30000")
-        elif price <= 40000:
-            tags.add("40000")
-        elif price <= 50000:
-            tags.add("50000")
-        elif price <= 60000:
-            tags.add("60000")
-        elif price <= 70000:
-            tags.add("70000")
-        elif price <= 80000:
-            tags.add("80000")
-        elif price <= 90000:
-            tags.add("90000")
-        elif price <= 100000:
-            tags.add("100000")
-        elif price <= 110000:
-            tags.add("110000")
-        elif price <= 120000:
-            tags.add("120000")
-        elif price <= 130000:
-            tags.add("130000")
-        elif price <= 140000:
-            tags.add("140000")
-        elif price <= 150000:
-            tags.add("150000")
-        elif price <= 160000:
-            tags.add("160000")
-        elif price <= 170000:
-            tags.add("170000")
-        elif price <= 180000:
-            tags.add("180000")
-        elif price <= 190000:
-            tags.add("190000")
-        elif price <= 200000:
-            tags.add("200000")
-    except:
-        pass
-
-    # Connectivity tag
-    try:
-        connectivity_features = [str(row.get("5G", "")), str(row.get("4G volte", "")), str(row.get("4G", "")), str(row.get("3G", "")), str(row.get("nfc", "")), str(row.get("sim slots", ""))]
-        connectivity_text = " ".join(connectivity_features).lower()
-        if any(keyword in connectivity_text for keyword in SUPPORTING_FEATURES["connectivity"]):
-            tags.add("connectivity")
-    except:
-        pass
-
-    # Storage tag
-    try:
-        storage = str(row.get("storage", "")) + " " + str(row.get("memory card support", ""))
-        if any(keyword in storage.lower() for keyword in SUPPORTING_FEATURES["storage"]):
-            tags.add("storage")
-    except:
-        pass
-
-    # Performance tag
-    try:
-        perf_text = str(row.get("ram", "")) + " " + str(row.get("processor", "")) + " " + str(row.get("processor type", ""))
-        if any(keyword in perf_text.lower() for keyword in SUPPORTING_FEATURES["performance"]):
-            tags.add("performance")
-    except:
-        pass
-
-    # Night photography tag
-    try:
-        camera_text = str(row.get("rear camera", "")).lower()
-        if any(kw in camera_text for kw in ["night", "ois", "sony sensor", "night vision", "low light"]):
-            tags.add("night photography")
-    except:
-        pass
-
-    # Ultra wide tag
-    try:
-        if "ultra wide" in str(row.get("rear camera", "")).lower():
-            tags.add("ultra wide")
-    except:
-        pass
-
-    # Design tag
-    try:
-        design_text = str(row.get("description", "")).lower() + " " + str(row.get("model", "")).lower()
-        if any(kw in design_text for kw in ["sleek", "modern", "premium", "glass back", "design", "aesthetic", "stylish"]):
-            tags.add("design")
-    except:
-        pass
+# Tag rules
+# Every tag is a declarative rule over the spec columns. compile_rules turns
+# the rules into column-at-a-time predicates, so tag_frame parses each spec
+# column once for the whole frame and evaluates all rules in one pass, and
+# into plain Python ones for tag_phone's single rows.
+# Rules can also be loaded from a JSON file of the same shape (load_rules),
+# so thresholds are tuned without touching code.
+#
+# Flag rules add "tag" where "when" holds:
+#   {"number": column, "min": x}            parsed number >= x ("above": x for >)
+#   {"number": column, "known": true}       the column has a number at all
+#   {"text": [columns], "contains": words}  lowercased text contains any word
+#   {"text": [columns], "in": values}       lowercased text equals one of values
+#   {"all": [...]} / {"any": [...]}
+# Numbers are parsed with "parse": "digits" (all digits of the cell, the
+# default), "max" (largest number) or "leading" (first decimal number);
+# "missing" fills rows without a number. words may name a KEYWORD_LISTS entry.
+# "requires" lists columns that must exist for the rule to apply at all.
+#
+# Value rules add a tag derived from a number or a text column:
+#   {"value": number, "sizes": [...], "label": "{}gb"}  first size >= value
+#   {"value": number, "label": "{}mp", "digits": 0}     the value itself, rounded
+#   {"value": {"text": column}, "label": "{}"}          the lowercased text
+RAM_SIZES = [2, 4, 6, 8, 12, 16]
+STORAGE_SIZES = [32, 64, 128, 256, 512]
+BATTERY_SIZES = [3000, 4000, 4500, 5000, 6000]
+PRICE_BUCKETS = list(range(10000, 200001, 10000))
+GAMING_PROCESSORS = ['snapdragon', 'mediatek', 'a13', 'a14', 'a15', 'a16', 'a17']
+DISPLAY_QUALITY = ['fhd', 'full hd', '1080', 'retina', 'oled']
+NIGHT_CAMERA = ["night", "ois", "sony sensor", "night vision", "low light"]
+DESIGN_WORDS = ["sleek", "modern", "premium", "glass back", "design", "aesthetic", "stylish"]
+COOLING_WORDS = ["cooling", "vapor chamber", "heat", "thermal", "liquid cooling", "game booster"]
+CREATOR_WORDS = ["youtube", "creator", "influencer", "video editing", "content"]
+BATCH_CHUNK_SIZE = 50000
+
+KEYWORD_LISTS = {
+    "gaming processors": GAMING_PROCESSORS,
+    "display quality": DISPLAY_QUALITY,
+    "night camera": NIGHT_CAMERA,
+    "design": DESIGN_WORDS,
+    "cooling": COOLING_WORDS,
+    "creator": CREATOR_WORDS,
+    "connectivity": SUPPORTING_FEATURES["connectivity"],
+    "storage": SUPPORTING_FEATURES["storage"],
+    "performance": SUPPORTING_FEATURES["performance"],
+}
 
-    # Cooling tag
-    try:
-        heat_text = str(row.get("processor", "")).lower() + " " + str(row.get("description", "")).lower()
-        if any(kw in heat_text for kw in ["cooling", "vapor chamber", "heat", "thermal", "liquid cooling", "game booster"]):
-            tags.add("cooling")
-    except:
-        pass
+TAG_RULES = [
+    {"tag": "gaming", "requires": ["ram", "refresh rate", "processor"], "when": {"all": [
+        {"number": "ram", "min": 6},
+        {"number": "refresh rate", "min": 90},
+        {"text": ["processor"], "contains": "gaming processors"},
+    ]}},
+    {"tag": "battery", "requires": ["battery"], "when": {"all": [
+        {"number": "battery", "known": True},
+        {"any": [{"number": "battery", "min": 5000}, {"text": ["charging speed"], "contains": ["fast"]}]},
+    ]}},
+    {"tag": "camera", "requires": ["rear camera", "front camera"], "when": {"all": [
+        {"number": "rear camera", "parse": "max", "missing": 0, "min": 12},
+        {"number": "front camera", "parse": "max", "missing": 0, "min": 12},
+    ]}},
+    {"tag": "display", "requires": ["display resolution", "model", "display size"], "when": {"all": [
+        {"number": "display size", "parse": "leading", "known": True},
+        {"any": [
+            {"text": ["display resolution"], "contains": "display quality"},
+            {"number": "display size", "parse": "leading", "min": 6.5},
+            {"text": ["model"], "contains": ["pro max"]},
+        ]},
+    ]}},
+    {"name": "budget", "requires": ["price"], "value": {"number": "price"}, "sizes": PRICE_BUCKETS, "label": "{}"},
+    {"tag": "connectivity", "when": {"text": ["5G", "4G volte", "4G", "3G", "nfc", "sim slots"], "contains": "connectivity"}},
+    {"tag": "storage", "when": {"text": ["storage", "memory card support"], "contains": "storage"}},
+    {"tag": "performance", "when": {"text": ["ram", "processor", "processor type"], "contains": "performance"}},
+    {"tag": "night photography", "when": {"text": ["rear camera"], "contains": "night camera"}},
+    {"tag": "ultra wide", "when": {"text": ["rear camera"], "contains": ["ultra wide"]}},
+    {"tag": "design", "when": {"text": ["description", "model"], "contains": "design"}},
+    {"tag": "cooling", "when": {"text": ["processor", "description"], "contains": "cooling"}},
+    {"tag": "vlogging", "when": {"text": ["description"], "contains": ["vlog"]}},
+    {"tag": "content creation", "when": {"text": ["description"], "contains": "creator"}},
+    {"name": "brand", "value": {"text": "brand"}, "label": "{}"},
+    # Spec tags
+    {"name": "ram", "spec": True, "value": {"number": "ram"}, "sizes": RAM_SIZES, "label": "{}gb"},
+    {"name": "storage size", "spec": True, "value": {"number": "storage"}, "sizes": STORAGE_SIZES, "label": "{}gb"},
+    {"name": "battery size", "spec": True, "value": {"number": "battery"}, "sizes": BATTERY_SIZES, "label": "{}mah"},
+    {"name": "display size", "spec": True, "value": {"number": "display size", "parse": "leading"}, "label": "{}", "digits": 1},
+    {"name": "refresh rate", "spec": True, "value": {"number": "refresh rate", "above": 0}, "label": "{}hz", "digits": 0},
+    {"tag": "5g", "spec": True, "when": {"text": ["5G"], "in": ["yes", "true", "supported", "1"]}},
+    {"tag": "fast charging", "spec": True, "when": {"text": ["charging speed"], "contains": ["fast"]}},
+    {"tag": "dual sim", "spec": True, "when": {"number": "sim slots", "default": "1", "min": 2}},
+    {"name": "rear camera", "spec": True, "value": {"number": "rear camera", "parse": "max"}, "label": "{}mp", "digits": 0},
+    {"name": "front camera", "spec": True, "value": {"number": "front camera", "parse": "max"}, "label": "{}mp front", "digits": 0},
+]
+
+def column_text(df, column, default=""):
+    # str(value) for every cell, like row.get(column, default) in tag_phone
+    if column not in df.columns:
+        return pd.Series(str(default), index=df.index, dtype=object)
+    return df[column].astype(str).fillna("nan").astype(object)
+
+def by_unique(text, parse):
+    # Scraped catalogs repeat the same spec strings, so parse each distinct value once
+    codes, uniques = pd.factorize(text, use_na_sentinel=False)
+    parsed = np.asarray(parse(pd.Series(uniques, dtype=object)))
+    return pd.Series(parsed[codes], index=text.index, dtype=parsed.dtype)
+
+def digits_value(text):
+    # int(re.sub(r"\D", "", text)), NaN where there are no digits
+    return by_unique(text, lambda values: pd.to_numeric(values.str.replace(r"\D", "", regex=True).replace("", None), errors="coerce").astype(float))
+
+def max_number(text):
+    # max of int(x) for x in re.findall(r"\d+", text), NaN where there are none
+    def parse(values):
+        found = values.str.extractall(r"(\d+)")[0].astype(np.int64)
+        return found.groupby(level=0).max().reindex(values.index).astype(float)
+    return by_unique(text, parse)
+
+def leading_number(text):
+    # float(re.search(r"\d+(\.\d+)?", text).group()), NaN where there is none
+    return by_unique(text, lambda values: pd.to_numeric(values.str.extract(r"(\d+(?:\.\d+)?)")[0], errors="coerce").astype(float))
+
+def contains_any(text, keywords):
+    pattern = "|".join(re.escape(kw) for kw in keywords)
+    return by_unique(text, lambda values: values.str.contains(pattern, regex=True).astype(bool)).to_numpy(dtype=bool)
+
+def lower_text(text):
+    return by_unique(text, lambda values: values.str.lower())
+
+NUMBER_PARSERS = {"digits": digits_value, "max": max_number, "leading": leading_number}
+
+class RuleColumns:
+    # Parsed columns for one frame, shared by every rule that reads them
+    def __init__(self, df):
+        self.df = df
+        self.parsed = {}
+
+    def number(self, spec):
+        key = ("number", spec["number"], spec.get("parse", "digits"), spec.get("default", ""))
+        if key not in self.parsed:
+            self.parsed[key] = NUMBER_PARSERS[key[2]](column_text(self.df, key[1], key[3])).to_numpy(dtype=float)
+        values = self.parsed[key]
+        if "missing" in spec:
+            values = np.where(np.isnan(values), spec["missing"], values)
+        if "above" in spec:
+            values = np.where(values > spec["above"], values, np.nan)
+        return values
+
+    def text(self, columns):
+        key = ("text",) + tuple(columns)
+        if key not in self.parsed:
+            text = column_text(self.df, columns[0])
+            for column in columns[1:]:
+                text = text + " " + column_text(self.df, column)
+            self.parsed[key] = lower_text(text)
+        return self.parsed[key]
+
+    def contains(self, columns, words):
+        return contains_any(self.text(columns), words)
+
+    def isin(self, columns, values):
+        return self.text(columns).isin(values).to_numpy(dtype=bool)
+
+    def labels(self, values, label):
+        return by_unique(pd.Series(values), lambda uniques: [None if np.isnan(v) else label(v) for v in uniques]).to_numpy(dtype=object)
+
+# A single row (a dict or Series) read with plain Python, so tag_phone does not
+# pay for building a one-row DataFrame. Rules are compiled for it separately
+# (compile_row_predicate, compile_row_value): numbers are floats, text is a str.
+NON_DIGIT_PATTERN = re.compile(r"\D")
+INTEGER_PATTERN = re.compile(r"\d+")
+DECIMAL_PATTERN = re.compile(r"\d+(\.\d+)?")
+ROW_PARSERS = {
+    "digits": lambda text: float(NON_DIGIT_PATTERN.sub("", text) or "nan"),
+    "max": lambda text: float(max((int(x) for x in INTEGER_PATTERN.findall(text)), default=np.nan)),
+    "leading": lambda text: float(match.group()) if (match := DECIMAL_PATTERN.search(text)) else np.nan,
+}
 
-    # Vlogging and content creation tags
+def number_key(spec):
+    return (spec["number"], spec.get("parse", "digits"), spec.get("default", ""))
+
+class RowColumns:
+    def __init__(self, row):
+        self.row = row.to_dict() if isinstance(row, pd.Series) else row
+        self.numbers = {}
+        self.texts = {}
+
+    def number(self, key):
+        value = self.numbers.get(key)
+        if value is None:
+            value = self.numbers[key] = ROW_PARSERS[key[1]](str(self.row.get(key[0], key[2])))
+        return value
+
+    def text(self, columns):
+        text = self.texts.get(columns)
+        if text is None:
+            text = self.texts[columns] = " ".join([str(self.row.get(column, "")) for column in columns]).lower()
+        return text
+
+def keyword_list(words):
+    if isinstance(words, str):
+        if words not in KEYWORD_LISTS:
+            raise ValueError(f"Unknown keyword list: {words}")
+        return KEYWORD_LISTS[words]
+    return list(words)
+
+def describe(predicate):
+    if "all" in predicate or "any" in predicate:
+        kind = "all" if "all" in predicate else "any"
+        return f" {'and' if kind == 'all' else 'or'} ".join(f"({describe(p)})" for p in predicate[kind])
+    if "number" in predicate:
+        column = predicate["number"]
+        if predicate.get("known"):
+            return f"{column} is known"
+        if "above" in predicate:
+            return f"{column} > {predicate['above']}"
+        return f"{column} >= {predicate['min']}"
+    if "in" in predicate:
+        return f"{' '.join(predicate['text'])} in {predicate['in']}"
+    words = predicate["contains"]
+    return f"{' + '.join(predicate['text'])} contains {words if isinstance(words, str) else ' | '.join(words)}"
+
+def compile_predicate(predicate):
+    # Returns a function of RuleColumns -> boolean array
+    if "all" in predicate or "any" in predicate:
+        combine = np.logical_and if "all" in predicate else np.logical_or
+        parts = [compile_predicate(p) for p in predicate["all" if "all" in predicate else "any"]]
+        def evaluate(columns):
+            mask = parts[0](columns)
+            for part in parts[1:]:
+                mask = combine(mask, part(columns))
+            return mask
+        return evaluate
+    if "number" in predicate:
+        if predicate.get("known"):
+            return lambda columns: ~np.isnan(columns.number(predicate))
+        if "above" in predicate:
+            return lambda columns: columns.number(predicate) > predicate["above"]
+        if "min" not in predicate:
+            raise ValueError(f"Number predicate needs min, above or known: {predicate}")
+        return lambda columns: columns.number(predicate) >= predicate["min"]
+    if "text" in predicate and "in" in predicate:
+        values = [value.lower() for value in predicate["in"]]
+        return lambda columns: columns.isin(predicate["text"], values)
+    if "text" in predicate and "contains" in predicate:
+        words = keyword_list(predicate["contains"])
+        return lambda columns: columns.contains(predicate["text"], words)
+    raise ValueError(f"Unknown predicate: {predicate}")
+
+def compile_value(rule):
+    # Returns a function of RuleColumns -> object array of tags, None where there is no tag
+    value = rule["value"]
+    label = rule.get("label", "{}")
+    if "text" in value:
+        return lambda columns: np.where(columns.text([value["text"]]) != "", columns.text([value["text"]]), None)
+    if "sizes" in rule:
+        sizes = np.array(rule["sizes"])
+        labels = np.array([label.format(size) for size in rule["sizes"]] + [None], dtype=object)
+        def bucket(columns):
+            # First size >= value; None where missing or above the largest size
+            values = columns.number(value)
+            known = ~np.isnan(values)
+            return np.where(known, labels[np.searchsorted(sizes, np.where(known, values, 0), side="left")], None)
+        return bucket
+    digits = rule.get("digits")
+    round_value = (lambda v: int(v)) if digits == 0 else (lambda v: round(float(v), digits)) if digits else float
+    return lambda columns: columns.labels(columns.number(value), lambda v: label.format(round_value(v)))
+
+def compile_row_number(spec):
+    # Returns a function of RowColumns -> float, with "missing" and "above" applied
+    key, missing, above = number_key(spec), spec.get("missing"), spec.get("above")
+    def number(columns):
+        value = columns.number(key)
+        if missing is not None and value != value:
+            value = missing
+        if above is not None and not value > above:
+            value = np.nan
+        return value
+    return number
+
+def compile_row_predicate(predicate):
+    # Returns a function of RowColumns -> bool, the single-row form of compile_predicate
+    if "all" in predicate or "any" in predicate:
+        parts = [compile_row_predicate(p) for p in predicate["all" if "all" in predicate else "any"]]
+        wanted = "any" in predicate
+        def combine(columns):
+            # Stops at the first part that settles it, false for "all" or true for "any"
+            for part in parts:
+                if part(columns) == wanted:
+                    return wanted
+            return not wanted
+        return combine
+    if "number" in predicate:
+        number = compile_row_number(predicate)
+        if predicate.get("known"):
+            return lambda columns: number(columns) == number(columns)
+        if "above" in predicate:
+            # compile_row_number already turned values not above the bound into NaN
+            return lambda columns: number(columns) > predicate["above"]
+        if "min" not in predicate:
+            raise ValueError(f"Number predicate needs min, above or known: {predicate}")
+        low = predicate["min"]
+        return lambda columns: number(columns) >= low
+    if "text" in predicate and "in" in predicate:
+        text_columns, values = tuple(predicate["text"]), {value.lower() for value in predicate["in"]}
+        return lambda columns: columns.text(text_columns) in values
+    if "text" in predicate and "contains" in predicate:
+        text_columns = tuple(predicate["text"])
+        pattern = re.compile("|".join(re.escape(word) for word in keyword_list(predicate["contains"])))
+        return lambda columns: pattern.search(columns.text(text_columns)) is not None
+    raise ValueError(f"Unknown predicate: {predicate}")
+
+def compile_row_value(rule):
+    # Returns a function of RowColumns -> tag or None, the single-row form of compile_value
+    value = rule["value"]
+    label = rule.get("label", "{}")
+    if "text" in value:
+        text_columns = (value["text"],)
+        return lambda columns: columns.text(text_columns) or None
+    number = compile_row_number(value)
+    if "sizes" in rule:
+        sizes = rule["sizes"]
+        labels = [label.format(size) for size in sizes] + [None]
+        def bucket(columns):
+            # First size >= value; None where missing or above the largest size
+            found = number(columns)
+            return labels[bisect.bisect_left(sizes, found)] if found == found else None
+        return bucket
+    digits = rule.get("digits")
+    round_value = (lambda v: int(v)) if digits == 0 else (lambda v: round(float(v), digits)) if digits else float
+    def labelled(columns):
+        found = number(columns)
+        return label.format(round_value(found)) if found == found else None
+    return labelled
+
+def compile_rules(rules):
+    # Returns [(name, requires, evaluate, evaluate_row)]; evaluate gives a tag (or
+    # None) per row of a RuleColumns, evaluate_row the tag for one RowColumns
+    compiled = []
+    for rule in rules:
+        if "tag" in rule:
+            predicate, row_predicate, tag = compile_predicate(rule["when"]), compile_row_predicate(rule["when"]), rule["tag"]
+            evaluate = lambda columns, predicate=predicate, tag=tag: np.where(predicate(columns), tag, None)
+            evaluate_row = lambda columns, predicate=row_predicate, tag=tag: tag if predicate(columns) else None
+        elif "value" in rule:
+            evaluate, evaluate_row = compile_value(rule), compile_row_value(rule)
+        else:
+            raise ValueError(f"Rule needs a tag or a value: {rule}")
+        compiled.append((rule.get("tag") or rule.get("name"), set(rule.get("requires", [])), evaluate, evaluate_row))
+    return compiled
+
+def load_rules(path):
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    compile_rules(rules)
+    return rules
+
+def rules_fingerprint(rules):
+    # Changes whenever a rule or a keyword list it names changes
+    resolved = json.dumps([rules, KEYWORD_LISTS], sort_keys=True, default=str)
+    return hashlib.sha256(resolved.encode("utf-8")).hexdigest()[:16]
+
+# The module's rule lists are compiled once at import; other lists are compiled
+# on first use and kept by fingerprint, up to COMPILED_RULES_LIMIT of them
+SPEC_RULES = [rule for rule in TAG_RULES if rule.get("spec")]
+COMPILED_RULES_LIMIT = 16
+builtin_rules = {id(TAG_RULES): compile_rules(TAG_RULES), id(SPEC_RULES): compile_rules(SPEC_RULES)}
+compiled_rules = OrderedDict()
+compiled_rules_lock = threading.Lock()
+
+def rules_for(rules):
+    compiled = builtin_rules.get(id(rules))
+    if compiled is not None:
+        return compiled
+    key = rules_fingerprint(rules)
+    with compiled_rules_lock:
+        compiled = compiled_rules.get(key)
+        if compiled is None:
+            compiled = compiled_rules[key] = compile_rules(rules)
+            while len(compiled_rules) > COMPILED_RULES_LIMIT:
+                compiled_rules.popitem(last=False)
+        else:
+            compiled_rules.move_to_end(key)
+    return compiled
+
+def evaluate_rules(columns, present, rows, rules):
+    tag_columns = [evaluate(columns) for _, requires, evaluate, _ in rules_for(rules) if requires <= present]
+    if not tag_columns:
+        return [[] for _ in range(rows)]
+    return [list({tag for tag in row_tags if tag is not None}) for row_tags in zip(*tag_columns)]
+
+def tag_frame(df, rules=TAG_RULES):
+    df = df.reset_index(drop=True)
+    return evaluate_rules(RuleColumns(df), set(df.columns), len(df), rules)
+
+def explain_tags(df, rules=TAG_RULES):
+    # For each row, {tag: rule} for the rules that fired, with the parts of
+    # "any" conditions that held ("battery >= 5000 or charging speed contains fast")
+    df = df.reset_index(drop=True)
+    columns = RuleColumns(df)
+    present = set(df.columns)
+    explanations = [{} for _ in range(len(df))]
+    for rule in rules:
+        if not set(rule.get("requires", [])) <= present:
+            continue
+        tags = compile_rules([rule])[0][2](columns)
+        for row in np.flatnonzero(tags != None):
+            explanations[row][tags[row]] = explain_predicate(rule["when"], columns, row) if "when" in rule else explain_value(rule, columns, row)
+    return explanations
+
+def explain_predicate(predicate, columns, row):
+    if "any" in predicate:
+        held = [explain_predicate(p, columns, row) for p in predicate["any"] if compile_predicate(p)(columns)[row]]
+        return held[0] if len(held) == 1 else "(" + " or ".join(held) + ")"
+    if "all" in predicate:
+        return " and ".join(explain_predicate(p, columns, row) for p in predicate["all"])
+    if "contains" in predicate:
+        text = columns.text(predicate["text"]).iloc[row]
+        found = [word for word in keyword_list(predicate["contains"]) if word in text]
+        return f"{' + '.join(predicate['text'])} contains {found[0]!r}" if found else describe(predicate)
+    if "in" in predicate:
+        return f"{' + '.join(predicate['text'])} is {columns.text(predicate['text'])[row]!r}"
+    if "number" in predicate and not predicate.get("known"):
+        return f"{describe(predicate)} ({columns.number(predicate)[row]:g})"
+    return describe(predicate)
+
+def explain_value(rule, columns, row):
+    value = rule["value"]
+    if "text" in value:
+        return f"{rule['name']} from {value['text']}"
+    return f"{rule['name']} from {value['number']} ({columns.number(value)[row]:g})"
+
+def tag_phone(row, rules=TAG_RULES):
+    # Tags for a single row (a dict or Series), evaluated with the same rules as tag_frame
+    columns = RowColumns(row)
+    present = columns.row.keys()
+    row_tags = [evaluate_row(columns) for _, requires, _, evaluate_row in rules_for(rules) if requires <= present]
+    return list({tag for tag in row_tags if tag is not None})
+
+def add_spec_tags(row, rules=TAG_RULES):
+    return tag_phone(row, SPEC_RULES if rules is TAG_RULES else [rule for rule in rules if rule.get("spec")])
+
+
+def tag_dataset(df, workers=None, chunk_size=BATCH_CHUNK_SIZE, rules=TAG_RULES):
+    # Tags for every row of df as a Series of lists; large frames are split
+    # into chunks and tagged in a process pool
+    workers = workers or os.cpu_count() or 1
+    if len(df) <= chunk_size or workers == 1:
+        tags = tag_frame(df, rules)
+    else:
+        chunks = [df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tags = [row_tags for chunk_tags in pool.map(partial(tag_frame, rules=rules), chunks) for row_tags in chunk_tags]
+    return pd.Series(tags, index=df.index, dtype=object)
+
+
+# Incremental re-tagging
+# A sidecar JSON cache maps a hash of each row's source columns to its tags, so
+# a refresh only tags rows that are new or whose specs changed. The cache
+# records rules_fingerprint, so editing any rule invalidates it; bump
+# TAG_RULES_VERSION when the rule compiler itself changes meaning.
+# The tagged CSV only grows by the new and changed rows of each run. It is
+# rewritten whole (compacted) when rows were removed, when its columns change,
+# or once the appended rows pass COMPACT_RATIO of the catalog.
+TAG_RULES_VERSION = 2
+COMPACT_RATIO = 0.25
+
+def cache_version(rules):
+    return f"{TAG_RULES_VERSION}:{rules_fingerprint(rules)}"
+
+def cache_path_for(output_path):
+    return output_path + ".tagcache.json"
+
+def row_hashes(df):
+    hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+    return [f"{value:016x}" for value in hashes.to_numpy()]
+
+def load_tag_cache(path, columns, rules=TAG_RULES):
+    # Returns (rows, appended): the cached tags and how many rows were appended
+    # to the tagged CSV since it was last written whole
     try:
-        desc = str(row.get("description", "")).lower()
-        if "vlog" in desc or "vlogging" in desc:
-            tags.add("vlogging")
-        if any(kw in desc for kw in ["youtube", "creator", "influencer", "video editing", "content"]):
-            tags.add("content creation")
-    except:
-        pass
-
-    # Brand tag (lowercase)
-    brand = str(row.get("brand", "")).lower()
-    if brand:
-        tags.add(brand)
-
-    # Add spec tags
-    tags.update(add_spec_tags(row))
-
-    return list(tags)
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}, 0
+    if cache.get("version") != cache_version(rules) or cache.get("columns") != list(columns):
+        return {}, 0
+    return cache.get("rows", {}), cache.get("appended", 0)
+
+def save_tag_cache(path, columns, rows, rules=TAG_RULES, appended=0):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": cache_version(rules), "columns": list(columns), "rows": rows, "appended": appended}, f)
+    os.replace(path + ".tmp", path)
+
+def append_tagged_rows(rows, output_path):
+    # The rows follow a repeat of the header line, which read_tagged_csv uses
+    # to tell them from the rows they replace
+    with open(output_path, "a", encoding="utf-8", newline="") as f:
+        rows.to_csv(f, index=False)
+
+def needs_compaction(tagged, report, output_path, appended):
+    if report["removed"] or not os.path.exists(output_path) or appended > COMPACT_RATIO * len(tagged):
+        return True
+    # Appended rows replace earlier ones by model, so models must be unique
+    if column_text(tagged, "model").duplicated().any():
+        return True
+    return list(pd.read_csv(output_path, nrows=0).columns) != list(tagged.columns)
+
+def retag_incremental(df, cache_path, rules=TAG_RULES, output_path=None, compact=False):
+    # Returns (tags, report); only rows missing from the cache are tagged. With
+    # output_path, the added and changed rows are appended to that tagged CSV,
+    # or the whole file is rewritten when it needs compacting (or compact is set)
+    source = df.drop(columns=["tags"], errors="ignore")
+    cached, appended = load_tag_cache(cache_path, source.columns, rules)
+    hashes = row_hashes(source)
+    models = column_text(source, "model").tolist()
+
+    stale = [i for i, key in enumerate(hashes) if key not in cached]
+    fresh_tags = tag_dataset(source.iloc[stale], rules=rules).tolist() if stale else []
+
+    known_models = {entry["model"] for entry in cached.values()}
+    current_models = set(models)
+    report = {
+        "added": [models[i] for i in stale if models[i] not in known_models],
+        "changed": [models[i] for i in stale if models[i] in known_models],
+        "removed": sorted(known_models - current_models),
+        "reused": len(df) - len(stale),
+        "stale_rows": stale,
+    }
+
+    rows = {key: cached[key] for key in hashes if key in cached}
+    for i, row_tags in zip(stale, fresh_tags):
+        rows[hashes[i]] = {"model": models[i], "tags": row_tags}
+    tags = pd.Series([rows[key]["tags"] for key in hashes], index=df.index, dtype=object)
+
+    # The tagged CSV is written before the cache, so a run cut short in between
+    # is tagged and appended again; the later copy of a row wins
+    report["compacted"] = False
+    if output_path:
+        tagged = source.assign(tags=tags)
+        appended += len(stale)
+        if compact or needs_compaction(tagged, report, output_path, appended):
+            tagged.to_csv(output_path, index=False)
+            report["compacted"], appended = True, 0
+        elif stale:
+            append_tagged_rows(tagged.iloc[stale], output_path)
+    save_tag_cache(cache_path, source.columns, rows, rules, appended)
+    return tags, report
+
+def write_delta(df, report, delta_path):
+    # Writes only the added/changed rows, marked in a "change" column
+    stale = report["stale_rows"]
+    delta = df.iloc[stale].copy()
+    added = set(report["added"])
+    delta["change"] = ["added" if model in added else "changed" for model in column_text(delta, "model")]
+    delta.to_csv(delta_path, index=False)
+    return delta
 
 
 if __name__ == "__main__":
-    df = pd.read_csv("final dataset.csv")
-    df['tags'] = df.apply(tag_phone, axis=1)
-    df.to_csv("tagged_dataset.csv", index=False)
+    source_path, output_path = "final dataset.csv", "tagged_dataset.csv"
+    df = pd.read_csv(source_path)
+
+    if "--dedup" in sys.argv:
+        from dedup import dedupe_frame
+        df, dedup_report = dedupe_frame(df)
+        print(f"Merged {dedup_report['merged_rows']} duplicate listings into {dedup_report['phones']} phones")
+
+    # --rules tag_rules.json replaces TAG_RULES with rules loaded from a file
+    rules = load_rules(sys.argv[sys.argv.index("--rules") + 1]) if "--rules" in sys.argv else TAG_RULES
+
+    # --explain "Galaxy A15" prints the rule behind each tag of the matching models
+    if "--explain" in sys.argv:
+        wanted = sys.argv[sys.argv.index("--explain") + 1].lower()
+        matches = df[column_text(df, "model").str.lower().str.contains(wanted, regex=False)]
+        for model, explanation in zip(matches["model"], explain_tags(matches, rules)):
+            print(f"\n{model}")
+            for tag, reason in sorted(explanation.items()):
+                print(f"  {tag:<18}: {reason}")
+        sys.exit(0)
+
+    if "--full" in sys.argv:
+        df['tags'] = tag_dataset(df, rules=rules)
+        df.to_csv(output_path, index=False)
+        save_tag_cache(cache_path_for(output_path), df.columns.drop("tags"), {
+            key: {"model": model, "tags": row_tags}
+            for key, model, row_tags in zip(row_hashes(df.drop(columns=["tags"])), column_text(df, "model"), df['tags'])
+        }, rules)
+    else:
+        # --compact rewrites the tagged CSV whole instead of appending to it
+        df['tags'], report = retag_incremental(df, cache_path_for(output_path), rules, output_path, compact="--compact" in sys.argv)
+        print(f"Reused {report['reused']} rows, added {len(report['added'])}, changed {len(report['changed'])}, removed {len(report['removed'])}")
+        for kind in ["added", "changed", "removed"]:
+            for model in report[kind][:20]:
+                print(f"  {kind:<8}: {model}")
+            if len(report[kind]) > 20:
+                print(f"  ... and {len(report[kind]) - 20} more {kind}")
+        if report["compacted"]:
+            print(f"Rewrote {output_path}")
+        elif report["stale_rows"]:
+            print(f"Appended {len(report['stale_rows'])} rows to {output_path}")
+        if report["stale_rows"] or report["removed"]:
+            write_delta(df, report, output_path.replace(".csv", ".delta.csv"))
+
     print(df[['model', 'brand', 'tags']].head(10))
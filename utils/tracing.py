@@ -0,0 +1,119 @@
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+# Per-request stage timings
+# A Trace is a stopwatch: each mark(stage) records the time since the previous
+# mark, so the stages add up to the total time of the request.
+class Trace:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.stages = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.start
+
+    def as_dict(self):
+        return {"stages_ms": {stage: seconds * 1000 for stage, seconds in self.stages.items()}, "total_ms": self.total * 1000}
+
+    def __repr__(self):
+        stages = ", ".join(f"{stage}={seconds * 1000:.2f}ms" for stage, seconds in self.stages.items())
+        return f"Trace({stages}, total={self.total * 1000:.2f}ms)"
+
+# Prometheus-style histograms
+# Buckets are upper bounds in seconds; render() writes the text exposition format
+# with cumulative bucket counts.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Histogram:
+    def __init__(self, name, help_text, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_value, series in self.series.items():
+                label = f'{self.label}="{label_value}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{label}}} {series['sum']}")
+                lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+stage_seconds = Histogram("phonix_stage_seconds", "Time spent in each recommend_phone stage.", "stage")
+request_seconds = Histogram("phonix_request_seconds", "Total recommend_phone time by outcome.", "outcome")
+
+def observe_trace(trace, outcome="ok"):
+    for stage, seconds in trace.stages.items():
+        stage_seconds.observe(stage, seconds)
+    request_seconds.observe(outcome, trace.total)
+
+def render_metrics():
+    return stage_seconds.render() + request_seconds.render()
+
+# Sampling profiler for slow requests
+# Runs cProfile on a random sample_rate fraction of calls and keeps the report
+# only when the call took at least slow_ms. At most one call is profiled at a
+# time because the interpreter allows a single active profiler.
+class SlowRequestProfiler:
+    def __init__(self, sample_rate=0.01, slow_ms=100.0, keep=20, output_dir=None, limit=25):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.output_dir = output_dir
+        self.limit = limit
+        self.reports = deque(maxlen=keep)
+        self.lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate or not self.lock.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            start = time.perf_counter()
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if elapsed_ms >= self.slow_ms:
+                    self.record(profile, elapsed_ms)
+        finally:
+            self.lock.release()
+
+    def record(self, profile, elapsed_ms):
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.limit)
+        report = {"time": time.time(), "elapsed_ms": elapsed_ms, "stats": out.getvalue()}
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            report["path"] = os.path.join(self.output_dir, f"slow-{int(report['time'] * 1000)}.prof")
+            profile.dump_stats(report["path"])
+        self.reports.append(report)